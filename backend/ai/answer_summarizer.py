@@ -1,21 +1,157 @@
 import google.generativeai as genai
-from typing import List, Dict, Optional, Union
+from typing import Callable, List, Dict, Optional, Tuple, Union
+import copy
 import logging
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from tenacity import retry, stop_after_attempt, wait_exponential
+import instrumentation
+from rate_limiter import RateLimiter
+from result_cache import ResultCache, content_key
+from token_budget import chars_per_token, dedupe_thread, fit_to_budget, get_tokenizer, output_token_limit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_PROMPT = """You are an expert AI summarizer. Create a concise yet comprehensive summary that:
+1. Preserves all key facts and figures
+2. Maintains the original meaning
+3. Is well-structured and readable
+4. Approximately {max_length} characters in length"""
+
+INCREMENTAL_SYSTEM_PROMPT = """You are an expert AI summarizer updating an existing summary of a Q&A thread.
+Merge the new or edited answers into the current summary so that it:
+1. Keeps every key fact from the current summary that is still valid
+2. Adds the key facts from the new or edited answers
+3. Is well-structured and readable
+4. Approximately {max_length} characters in length"""
+
+def _count_retry(retry_state) -> None:
+    """tenacity before_sleep hook: one count per retried attempt"""
+    instrumentation.increment("summarizer.retry")
+
+def _build_prompt(system_prompt: str, max_length: int, source: str) -> str:
+    """Prompt for one summary; the requirements block is added unless the system prompt sets the length"""
+    if "{max_length}" in system_prompt:
+        # The built-in prompts already state length and content rules; only add what they lack
+        return (f"{system_prompt.format(max_length=max_length)}\n"
+                f"Keep the original tone. Output ONLY the summary text.\n\n"
+                f"**Original Text:**\n{source}")
+    return (f"{system_prompt}\n\n"
+            f"**Original Text:**\n{source}\n\n"
+            f"**Summary Requirements:**\n"
+            f"- Length: ~{max_length} characters\n"
+            f"- Include all key points\n"
+            f"- Maintain original tone\n"
+            f"- Use clear, concise language\n"
+            f"- Output ONLY the summary text")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Gemini models (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def _pack(pieces: List[Tuple[str, str]], max_tokens: int,
+          count_tokens: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """Greedily join (separator, piece) pairs into token-bounded chunks; each separator precedes its piece"""
+    chunks, current = [], ""
+    for separator, piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if current and count_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _split_to_fit(text: str, max_tokens: int, pattern: str, joiner: str,
+                  count_tokens: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """Greedily pack the pieces of text separated by pattern into token-bounded chunks, rejoined with joiner"""
+    pieces = [(joiner, piece.strip()) for piece in re.split(pattern, text) if piece.strip()]
+    return _pack(pieces, max_tokens, count_tokens)
+
+def split_into_chunks(text: str, max_tokens: int,
+                      count_tokens: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens tokens.
+    
+    Splits on paragraph (answer) boundaries first, falling back to sentence
+    and then word boundaries only for paragraphs that are too long on their own.
+    Pieces of a split paragraph are rejoined with spaces, so the paragraph
+    structure the model sees is unchanged.
+    
+    Args:
+        text: Text to split
+        max_tokens: Token budget per chunk
+        count_tokens: Token counter (defaults to the ~4 characters per token estimate)
+        
+    Returns:
+        List of chunks, in order
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            pieces.append(("\n\n", paragraph))
+            continue
+        separator = "\n\n"
+        for sentence_chunk in _split_to_fit(paragraph, max_tokens, r"(?<=[.!?])\s+", " ", count_tokens):
+            if count_tokens(sentence_chunk) <= max_tokens:
+                parts = [sentence_chunk]
+            else:
+                parts = _split_to_fit(sentence_chunk, max_tokens, r"\s+", " ", count_tokens)
+            for part in parts:
+                pieces.append((separator, part))
+                separator = " "
+    return _pack(pieces, max_tokens, count_tokens)
+
 class GeminiFlashSummarizer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: Optional[str] = None, model=None,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 cache_size: int = 0,
+                 cache_ttl: Optional[float] = None,
+                 cache_path: Optional[str] = None,
+                 tokenizer=None,
+                 dedupe: bool = True,
+                 max_input_tokens: Optional[int] = None):
         """
         Initialize the Gemini 1.5 Flash summarizer
         
         Args:
             api_key: Your Gemini API key
+            model: Preconfigured model client (e.g. FakeGenerativeModel); skips Gemini setup
+            requests_per_minute: Client-side request rate limit (None for no limit)
+            tokens_per_minute: Client-side input + output token rate limit (None for no limit)
+            cache_size: Number of summaries to keep in an LRU cache (0 disables it)
+            cache_ttl: Seconds before a cached summary is regenerated (None for no expiry)
+            cache_path: Optional SQLite file so cached summaries survive restarts
+            tokenizer: Local token counter: None (~4 chars/token), a tokenizer.json path,
+                a text -> count function or an object with count(text)
+            dedupe: Drop quotes, code blocks and paragraphs repeated within the text before sending
+            max_input_tokens: Trim source text beyond this many tokens (None never trims)
         """
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.model_name = 'gemini-1.5-flash'
+        self.tokenizer = get_tokenizer(tokenizer)
+        self.dedupe = dedupe
+        self.max_input_tokens = max_input_tokens
+        
+        self.cache = None
+        if cache_size or cache_path:
+            self.cache = ResultCache(max_entries=cache_size or 10000, path=cache_path, ttl=cache_ttl)
+        
+        if model is not None:
+            self.model = model
+            self.model_name = getattr(model, 'model_name', type(model).__name__)
+            logger.info(f"Using provided model client: {type(model).__name__}")
+            return
+        
         try:
             # Configure the API with better timeout settings
             genai.configure(
@@ -43,7 +179,7 @@ class GeminiFlashSummarizer:
             ]
             
             self.model = genai.GenerativeModel(
-                'gemini-1.5-flash',
+                self.model_name,
                 generation_config=generation_config,
                 safety_settings=safety_settings
             )
@@ -53,21 +189,20 @@ class GeminiFlashSummarizer:
             logger.error(f"Failed to initialize Gemini: {e}")
             raise RuntimeError(f"Could not initialize Gemini: {e}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def summarize(
         self,
         text: str,
         max_length: int = 300,
         temperature: float = 0.3,
-        system_prompt: str = """You are an expert AI summarizer. Create a concise yet comprehensive summary that:
-1. Preserves all key facts and figures
-2. Maintains the original meaning
-3. Is well-structured and readable
-4. Approximately {max_length} characters in length"""
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT
     ) -> Dict[str, Union[str, Dict]]:
         """
         Generate a high-quality summary using Gemini 1.5 Flash
         
+        When caching is enabled, summaries are keyed on the text, parameters,
+        model and system prompt, and concurrent requests for the same key
+        share a single model call.
+        
         Args:
             text: Input text to summarize
             max_length: Target summary length in characters
@@ -77,43 +212,93 @@ class GeminiFlashSummarizer:
         Returns:
             Dictionary containing summary and metadata
         """
+        if self.cache is None:
+            return self._generate_summary(text, max_length, temperature, system_prompt)
+        
+        start_time = time.time()
+        # Deduplication, the input budget and the tokenizer all change the prompt actually sent
+        key = content_key(text, str(max_length), str(temperature), self.model_name,
+                          content_key(system_prompt), str(self.dedupe), str(self.max_input_tokens),
+                          getattr(self.tokenizer, "name", type(self.tokenizer).__name__))
+        result, hit = self.cache.get_or_compute(
+            key, lambda: self._generate_summary(text, max_length, temperature, system_prompt)
+        )
+        
+        instrumentation.increment("summarizer.cache_hit" if hit else "summarizer.cache_miss")
+        
+        # Hand out a copy so callers can't modify the cached entry
+        result = copy.deepcopy(result)
+        details = result["details"]
+        details["cache"] = {
+            "hit": hit,
+            "latency_saved": details["processing_time"] if hit else 0.0,
+            **self.cache.stats()
+        }
+        if hit:
+            details["processing_time"] = round(time.time() - start_time, 2)
+        return result
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10),
+           before_sleep=_count_retry)
+    def _generate_summary(
+        self,
+        text: str,
+        max_length: int,
+        temperature: float,
+        system_prompt: str
+    ) -> Dict[str, Union[str, Dict]]:
+        """Call the model once (with retries) and build the result dictionary"""
         try:
             start_time = time.time()
             
-            # Enhanced prompt engineering
-            prompt = f"""{system_prompt.format(max_length=max_length)}
-            
-            **Original Text:**
-            {text}
+            source, budget = self._prepare_source(text)
+            prompt = _build_prompt(system_prompt, max_length, source)
             
-            **Summary Requirements:**
-            - Length: ~{max_length} characters
-            - Include all key points
-            - Maintain original tone
-            - Use clear, concise language
-            - Output ONLY the summary text"""
+            # Output cap from the input's measured characters per token, not a fixed ratio
+            input_tokens = self.tokenizer.count(prompt)
+            max_output_tokens = output_token_limit(max_length, source, self.tokenizer)
+            with instrumentation.timer("summarizer.rate_limit_wait"):
+                self.rate_limiter.acquire(input_tokens + max_output_tokens)
             
             # Generate with optimized parameters
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "max_output_tokens": int(max_length * 0.7),  # More accurate token estimation
-                    "candidate_count": 1
-                }
-            )
+            with instrumentation.timer("summarizer.generate"):
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config={
+                        "temperature": temperature,
+                        "max_output_tokens": max_output_tokens,
+                        "candidate_count": 1
+                    }
+                )
             
             summary = response.text.strip()
             elapsed = time.time() - start_time
             
+            # Prefer the API's own usage numbers when the client reports them
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None and getattr(usage, "prompt_token_count", None):
+                input_tokens = usage.prompt_token_count
+                output_tokens = usage.candidates_token_count
+                token_source = "api"
+            else:
+                output_tokens = self.tokenizer.count(summary)
+                token_source = getattr(self.tokenizer, "name", type(self.tokenizer).__name__)
+            
             return {
                 "summary": summary,
                 "details": {
-                    "model": "gemini-1.5-flash",
+                    "model": self.model_name,
                     "input_length": len(text),
                     "summary_length": len(summary),
                     "processing_time": round(elapsed, 2),
-                    "compression_ratio": round(len(text)/len(summary), 1),
+                    "compression_ratio": round(len(text) / max(len(summary), 1), 1),
+                    "tokens": {
+                        "input": input_tokens,
+                        "output": output_tokens,
+                        "max_output": max_output_tokens,
+                        "source": token_source,
+                        **budget
+                    },
                     "parameters": {
                         "max_length": max_length,
                         "temperature": temperature
@@ -123,8 +308,34 @@ class GeminiFlashSummarizer:
             
         except Exception as e:
             logger.error(f"Summarization failed: {str(e)}")
+            instrumentation.increment("summarizer.attempt_error")
             raise  # Re-raise for retry
 
+    def _prepare_source(self, text: str) -> Tuple[str, Dict]:
+        """Deduplicate and trim text to the input budget, reporting what was removed"""
+        source, budget = text, {}
+        if self.dedupe:
+            source, removed = dedupe_thread(text)
+            budget["deduplicated"] = removed
+        if self.max_input_tokens:
+            source, budget["trimmed"] = fit_to_budget(source, self.max_input_tokens, self.tokenizer)
+        if source != text:
+            budget["saved"] = max(0, self.tokenizer.count(text) - self.tokenizer.count(source))
+        return source, budget
+
+    def _summarize_item(self, text: str, max_length: int, **kwargs) -> Dict:
+        """Summarize one batch item, turning a final failure into an error placeholder"""
+        try:
+            return self.summarize(text, max_length, **kwargs)
+        except Exception as e:
+            logger.error(f"Summarization failed after retries: {str(e)}")
+            instrumentation.increment("summarizer.error")
+            return {
+                "summary": "",
+                "error": str(e),
+                "details": {"input_text": text[:100] + "..."}
+            }
+
     def batch_summarize(
         self,
         texts: List[str],
@@ -135,31 +346,174 @@ class GeminiFlashSummarizer:
         """
         Efficient batch summarization with rate limiting
         
+        Requests run concurrently on a bounded thread pool and share the
+        client's rate limiter. Each item is retried on its own, so a failure
+        only produces an error placeholder for that item.
+        
         Args:
             texts: List of texts to summarize
             max_length: Target summary length
-            batch_size: Number of parallel requests
+            batch_size: Number of parallel requests (maximum in flight)
+            kwargs: Additional parameters for summarize()
+            
+        Returns:
+            List of summary results, in input order
+        """
+        return self._run_parallel(self._summarize_item, texts, batch_size, max_length, **kwargs)
+
+    def _run_parallel(self, fn, texts: List[str], max_workers: int, *args, **kwargs) -> List:
+        """Call fn(text, *args, **kwargs) for every text on a bounded pool, keeping input order"""
+        if not texts:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(texts)))) as pool:
+            futures = [pool.submit(fn, text, *args, **kwargs) for text in texts]
+            return [future.result() for future in futures]
+
+    def summarize_hierarchical(
+        self,
+        text: str,
+        max_length: int = 300,
+        chunk_tokens: int = 4000,
+        chunk_summary_length: Optional[int] = None,
+        reduce_fan_in: int = 4,
+        max_workers: int = 5,
+        **kwargs
+    ) -> Dict[str, Union[str, Dict]]:
+        """
+        Map-reduce summarization for threads too long for a single prompt
+        
+        The text is split into token-bounded chunks on paragraph (answer)
+        boundaries and the chunks are summarized concurrently. The partial
+        summaries are then combined, in more than one round if they still
+        don't fit in one chunk, before a final summary is produced.
+        
+        Args:
+            text: Input text to summarize
+            max_length: Target length of the final summary in characters
+            chunk_tokens: Token budget for each model input
+            chunk_summary_length: Target length of partial summaries (defaults to max_length)
+            reduce_fan_in: Minimum number of partial summaries that fit in one reduce prompt
+            max_workers: Number of parallel requests
             kwargs: Additional parameters for summarize()
             
         Returns:
-            List of summary results
+            Same dictionary as summarize(), with chunk counts and per-stage timings in details
         """
-        results = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            try:
-                batch_results = [self.summarize(text, max_length, **kwargs) for text in batch]
-                results.extend(batch_results)
-                time.sleep(1)  # Rate limiting
-            except Exception as e:
-                logger.error(f"Batch failed at index {i}: {str(e)}")
-                # Add error placeholders for failed items
-                results.extend({
-                    "summary": "",
-                    "error": str(e),
-                    "details": {"input_text": text[:100] + "..."}
-                } for text in batch)
-        return results
+        start_time = time.time()
+        stage_times = {"map": 0.0, "reduce": 0.0, "final": 0.0}
+        source = dedupe_thread(text)[0] if self.dedupe else text
+        # Keep partials short enough that each reduce round merges several of them
+        chunk_chars = int(chunk_tokens * chars_per_token(source, self.tokenizer))
+        chunk_summary_length = min(chunk_summary_length or max_length, chunk_chars // max(reduce_fan_in, 2))
+        
+        # Map: summarize each chunk independently
+        chunks = split_into_chunks(source, chunk_tokens, self.tokenizer.count)
+        partials = [text]
+        reduce_rounds = 0
+        if len(chunks) > 1:
+            stage_start = time.time()
+            results = self._run_parallel(self.summarize, chunks, max_workers, chunk_summary_length, **kwargs)
+            partials = [result["summary"] for result in results]
+            stage_times["map"] = time.time() - stage_start
+            
+            # Reduce: merge partial summaries until they fit in a single prompt
+            stage_start = time.time()
+            while self.tokenizer.count("\n\n".join(partials)) > chunk_tokens and len(partials) > 1:
+                groups = split_into_chunks("\n\n".join(partials), chunk_tokens, self.tokenizer.count)
+                if len(groups) >= len(partials):
+                    break  # Partials no longer shrink; let the final pass handle it
+                results = self._run_parallel(self.summarize, groups, max_workers, chunk_summary_length, **kwargs)
+                partials = [result["summary"] for result in results]
+                reduce_rounds += 1
+            stage_times["reduce"] = time.time() - stage_start
+        
+        stage_start = time.time()
+        result = self.summarize("\n\n".join(partials), max_length, **kwargs)
+        stage_times["final"] = time.time() - stage_start
+        for stage, elapsed in stage_times.items():
+            instrumentation.observe(f"summarizer.hierarchical.{stage}", elapsed)
+        
+        summary = result["summary"]
+        result["details"].update({
+            "input_length": len(text),
+            "processing_time": round(time.time() - start_time, 2),
+            "compression_ratio": round(len(text) / max(len(summary), 1), 1),
+            "chunk_count": len(chunks),
+            "reduce_rounds": reduce_rounds,
+            "stage_times": {stage: round(elapsed, 2) for stage, elapsed in stage_times.items()}
+        })
+        return result
+
+    def summarize_incremental(
+        self,
+        answers: Dict[str, str],
+        previous: Optional[Dict] = None,
+        load_thread: Optional[Callable[[], Dict[str, str]]] = None,
+        max_length: int = 300,
+        temperature: float = 0.3,
+        max_drift: int = 10
+    ) -> Dict[str, Union[str, Dict]]:
+        """
+        Update a thread summary with new or edited answers only
+        
+        Each result records which answer IDs it covers (with a content hash)
+        in details["coverage"]. Given that result as previous, only answers
+        that are new or whose content changed are sent to the model along
+        with the previous summary. After max_drift answers have been folded
+        in this way, the summary is rebuilt from the full thread.
+        
+        Args:
+            answers: New or edited answers as answer_id -> content (the whole
+                thread when there is no previous summary)
+            previous: Result of an earlier summarize_incremental() call
+            load_thread: Returns every answer of the thread; needed for rebuilds
+                once previous exists
+            max_length: Target summary length in characters
+            temperature: Controls creativity (0.0-1.0)
+            max_drift: Answers merged incrementally before a full rebuild
+            
+        Returns:
+            Dictionary containing summary and metadata, including coverage
+        """
+        covered = dict(previous["details"]["coverage"]["answers"]) if previous else {}
+        drift = previous["details"]["coverage"]["updates_since_rebuild"] if previous else 0
+        changed = {
+            answer_id: content for answer_id, content in answers.items()
+            if covered.get(answer_id) != content_key(content)
+        }
+        
+        if previous and not changed:
+            result = copy.deepcopy(previous)
+            result["details"]["coverage"]["mode"] = "unchanged"
+            return result
+        
+        if previous is None or drift + len(changed) > max_drift:
+            # Full rebuild: summarize the whole thread from scratch
+            thread = answers if previous is None else None
+            if thread is None:
+                if load_thread is None:
+                    raise ValueError("Drift limit reached; load_thread is required to rebuild the summary")
+                thread = load_thread()
+            text = "\n\n".join(thread.values())
+            result = self.summarize_hierarchical(text, max_length, temperature=temperature)
+            covered = {answer_id: content_key(content) for answer_id, content in thread.items()}
+            drift, mode = 0, "full"
+        else:
+            # Incremental: previous summary plus only what changed
+            updates = "\n\n".join(changed.values())
+            text = f"Current summary:\n{previous['summary']}\n\nNew or edited answers:\n{updates}"
+            result = self.summarize(text, max_length, temperature, system_prompt=INCREMENTAL_SYSTEM_PROMPT)
+            covered.update({answer_id: content_key(content) for answer_id, content in changed.items()})
+            drift, mode = drift + len(changed), "incremental"
+        
+        result["details"]["coverage"] = {
+            "answers": covered,
+            "updates_since_rebuild": drift,
+            "changed_answers": sorted(changed),
+            "mode": mode
+        }
+        return result
 
 
 # Example usage
@@ -252,4 +606,4 @@ if __name__ == "__main__":
             print(f"Error: {res['error']}")
         else:
             print(f"Length: {len(res['summary'])} chars")
-            print("---\n" + res['summary'] + "\n---")
\ No newline at end of file
+            print("---\n" + res['summary'] + "\n---")
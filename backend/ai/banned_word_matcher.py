@@ -0,0 +1,72 @@
+import ahocorasick
+from typing import Iterable, List, Tuple
+
+
+class BannedWordMatcher:
+    def __init__(self, words: Iterable[str], word_boundary: bool = False):
+        """
+        Precompiled multi-pattern matcher for banned words.
+
+        All words are compiled into a single Aho-Corasick automaton, so a
+        lookup is one linear pass over the text no matter how many words
+        are on the list.
+
+        Args:
+            words: Words or phrases to match (case-insensitive)
+            word_boundary: Only match whole words, so "ass" does not match "class"
+        """
+        self.words = frozenset(word.lower() for word in words if word)
+        self.word_boundary = word_boundary
+        self._automaton = None
+
+        if self.words:
+            automaton = ahocorasick.Automaton()
+            for word in self.words:
+                automaton.add_word(word, (len(word), word))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def _is_word_char(char: str) -> bool:
+        return char.isalnum() or char == '_'
+
+    def _on_boundary(self, text: str, start: int, end: int) -> bool:
+        """Check that a match is not part of a larger word"""
+        if start > 0 and self._is_word_char(text[start]) and self._is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and self._is_word_char(text[end - 1]) and self._is_word_char(text[end]):
+            return False
+        return True
+
+    def _iter_matches(self, text: str):
+        if self._automaton is None or not text:
+            return
+        text = text.lower()
+        for end_index, (length, word) in self._automaton.iter(text):
+            start, end = end_index - length + 1, end_index + 1
+            if self.word_boundary and not self._on_boundary(text, start, end):
+                continue
+            yield start, end, word
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Find every banned word occurrence in text.
+
+        Returns:
+            List of (start, end, word) spans into the lowercased text, ordered by end position
+        """
+        return list(self._iter_matches(text))
+
+    def matched_words(self, text: str) -> List[str]:
+        """Distinct banned words found in text, in order of first occurrence"""
+        seen = {}
+        for _, _, word in self._iter_matches(text):
+            seen.setdefault(word, None)
+        return list(seen)
+
+    def contains(self, text: str) -> bool:
+        """Check whether text contains any banned word, stopping at the first match"""
+        return next(self._iter_matches(text), None) is not None
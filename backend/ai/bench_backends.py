@@ -0,0 +1,81 @@
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import time
+
+import numpy as np
+
+sample_texts = [
+    "Your question is very dumb. how are you not in playschool?",
+    "This is a perfectly normal comment.",
+    "I respectfully disagree with your opinion.",
+    "You're an idiot who shouldn't be allowed to post here!",
+    "Thanks, setting the Authorization header fixed my 401 error. I was storing the JWT in "
+    "localStorage and forgot to send it with the fetch call, so every protected route failed."
+]
+
+
+def run_backend(backend, model_type, runs, batch_size, threads):
+    """Benchmark one backend; runs in its own process so memory numbers don't mix"""
+    from moderation_bot import ToxicityChecker
+
+    start = time.perf_counter()
+    checker = ToxicityChecker(model_type=model_type, backend=backend, onnx_threads=threads)
+    load_time = time.perf_counter() - start
+    checker.batch_check(sample_texts)  # warmup
+
+    latencies = []
+    for i in range(runs):
+        text = sample_texts[i % len(sample_texts)]
+        start = time.perf_counter()
+        checker.model.predict(text)
+        latencies.append(time.perf_counter() - start)
+
+    batch = (sample_texts * (batch_size // len(sample_texts) + 1))[:batch_size]
+    start = time.perf_counter()
+    for _ in range(max(1, runs // 10)):
+        checker.batch_check(batch, batch_size=batch_size)
+    batch_elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "load_time_s": round(load_time, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "batch_texts_per_s": round(max(1, runs // 10) * batch_size / batch_elapsed, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency and memory of ToxicityChecker backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model-type", default="original")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX intra-op threads")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for backend in args.backends:
+            results.append(pool.apply(
+                run_backend, (backend, args.model_type, args.runs, args.batch_size, args.threads)
+            ))
+
+    print(f"{'backend':<10} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch/s':>9} {'RSS MB':>8}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['load_time_s']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['batch_texts_per_s']:>9} {r['peak_rss_mb']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
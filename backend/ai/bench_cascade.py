@@ -0,0 +1,78 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+import synthetic_corpus
+from moderation_bot import ToxicityChecker
+from moderation_cascade import ModerationCascade
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    results = fn(texts)
+    return results, len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalation rate, throughput and agreement of ModerationCascade "
+                                                 "against the full model")
+    parser.add_argument("--train", type=int, default=2000, help="Texts the pre-filter is fitted on")
+    parser.add_argument("--texts", type=int, default=5000, help="Labeled texts to evaluate on")
+    parser.add_argument("--toxic-rate", type=float, default=0.1)
+    parser.add_argument("--targets", type=float, nargs="+", default=[0.9, 0.95, 0.99, 1.0],
+                        help="Recall targets to sweep")
+    parser.add_argument("--banned-words", nargs="*", default=[])
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    checker = ToxicityChecker(backend=args.backend, batch_size=args.batch_size, banned_words=args.banned_words)
+    training = synthetic_corpus.make_comments(args.train, toxic_rate=args.toxic_rate, seed=0)
+    labeled = synthetic_corpus.make_labeled_comments(args.texts, toxic_rate=args.toxic_rate, seed=1)
+    texts = [text for text, _ in labeled]
+    labels = np.array([toxic for _, toxic in labeled])
+    checker.batch_check(texts[:args.batch_size])  # warmup
+
+    full, full_rate = timed(checker.batch_check, texts)
+    full_flags = np.array([result["flagged"] for result in full])
+
+    cascade = ModerationCascade(checker)
+    start = time.perf_counter()
+    fit = cascade.fit(training)
+    fit_s = time.perf_counter() - start
+
+    results = [{"mode": "full", "target_recall": None, "escalated": 1.0, "texts_per_s": round(full_rate, 1),
+                "speedup": 1.0, "agreement": 1.0, "recall_vs_full": 1.0,
+                "label_recall": round(float(full_flags[labels].mean()), 4) if labels.any() else None}]
+    print(f"{'mode':<14} {'escalated':>9} {'texts/s':>10} {'speedup':>8} {'agree':>7} {'rec/full':>9} {'rec/label':>9}")
+    for target in args.targets:
+        cascade.target_recall = target
+        checked, rate = timed(cascade.batch_check, texts)
+        flags = np.array([result["flagged"] for result in checked])
+        escalated = np.mean([result["stage"] == "model" for result in checked])
+        results.append({
+            "mode": "cascade", "target_recall": target, "escalated": round(float(escalated), 4),
+            "texts_per_s": round(rate, 1), "speedup": round(rate / full_rate, 2),
+            "agreement": round(float(np.mean(flags == full_flags)), 4),
+            "recall_vs_full": round(float(flags[full_flags].mean()), 4) if full_flags.any() else None,
+            "label_recall": round(float(flags[labels].mean()), 4) if labels.any() else None
+        })
+
+    for result in results:
+        mode = result["mode"] if result["target_recall"] is None else f"cascade@{result['target_recall']}"
+        print(f"{mode:<14} {result['escalated']:>9.1%} {result['texts_per_s']:>10} {result['speedup']:>8} "
+              f"{result['agreement']:>7} {result['recall_vs_full']!s:>9} {result['label_recall']!s:>9}")
+    print(f"pre-filter fitted in {fit_s:.1f}s on {fit['training']} texts "
+          f"({fit['calibration']} held out, RMSE {fit['rmse']:.4f})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"config": vars(args), "fit": {**fit, "seconds": round(fit_s, 2)}, "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
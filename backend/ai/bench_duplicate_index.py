@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import synthetic_corpus
+from duplicate_index import DuplicateIndex
+
+
+def reword(question, rng, drop=0.15):
+    """A near-duplicate: the same question with some words dropped"""
+    title, description = question
+    words = [word for word in description.split() if rng.random() > drop]
+    return title, " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, query and reload a DuplicateIndex over synthetic questions")
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--num-bits", type=int, default=12)
+    parser.add_argument("--num-tables", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=2)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    questions = synthetic_corpus.make_questions(args.questions, seed=0)
+    index = DuplicateIndex(num_bits=args.num_bits, num_tables=args.num_tables, probes=args.probes)
+
+    start = time.perf_counter()
+    for offset in range(0, len(questions), 256):
+        index.add((offset + i, title, description)
+                  for i, (title, description) in enumerate(questions[offset:offset + 256]))
+    build_s = time.perf_counter() - start
+
+    # Queries are reworded copies of indexed questions; the original is the duplicate to find
+    rng = random.Random(1)
+    originals = rng.sample(range(len(questions)), args.queries)
+    queries = [reword(questions[i], rng) for i in originals]
+    vectors = index._embed([index._question_text(title, description) for title, description in queries])
+
+    timings = {}
+    found = {}
+    for mode, exact in (("exact", True), ("lsh", False)):
+        latencies = []
+        found[mode] = []
+        for vector in vectors:
+            call_start = time.perf_counter()
+            found[mode].append({question_id for question_id, _ in index.top_k(vector, args.k, exact=exact)})
+            latencies.append(time.perf_counter() - call_start)
+        timings[mode] = np.array(latencies) * 1000
+    recall = np.mean([len(lsh & exact) / max(len(exact), 1) for lsh, exact in zip(found["lsh"], found["exact"])])
+    hits = {mode: np.mean([original in ids for original, ids in zip(originals, found[mode])]) for mode in found}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "questions")
+        start = time.perf_counter()
+        index.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        DuplicateIndex.load(path, embedder=index.embedder)
+        load_s = time.perf_counter() - start
+
+    results = {
+        "questions": len(index),
+        "build_questions_per_s": round(len(index) / build_s, 1),
+        "vector_mb": round(index._matrix[:len(index)].nbytes / 2 ** 20, 2),
+        "exact_p50_ms": round(float(np.percentile(timings["exact"], 50)), 3),
+        "exact_p99_ms": round(float(np.percentile(timings["exact"], 99)), 3),
+        "lsh_p50_ms": round(float(np.percentile(timings["lsh"], 50)), 3),
+        "lsh_p99_ms": round(float(np.percentile(timings["lsh"], 99)), 3),
+        f"recall_at_{args.k}": round(float(recall), 3),
+        "exact_duplicate_found": round(float(hits["exact"]), 3),
+        "lsh_duplicate_found": round(float(hits["lsh"]), 3),
+        "save_s": round(save_s, 3),
+        "load_s": round(load_s, 3)
+    }
+    for key, value in results.items():
+        print(f"{key:<24} {value:>12}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import synthetic_corpus
+from moderation_pool import ModerationPool
+
+
+def memory_mb(pid):
+    """(RSS, PSS) of a process in MB; PSS splits shared pages between the processes sharing them"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0]] = int(parts[1]) / 1024
+    except OSError:
+        return None, None  # Not Linux
+    return values.get("Rss:"), values.get("Pss:")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput scaling of ModerationPool over 1..N workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    texts = synthetic_corpus.make_comments(args.texts, seed=1)
+    results = []
+    print(f"{'workers':>8} {'texts/s':>10} {'speedup':>8} {'effic.':>7} {'worker RSS MB':>14} {'worker PSS MB':>14}")
+    for workers in range(1, args.max_workers + 1):
+        with ModerationPool(workers, args.threads_per_worker, args.batch_size, backend=args.backend) as pool:
+            pool.batch_check(texts[:workers * args.batch_size])  # warmup every worker
+
+            start = time.perf_counter()
+            pool.batch_check(texts)
+            elapsed = time.perf_counter() - start
+
+            memory = [memory_mb(child.pid) for child in mp.active_children()]
+            rss = sum(m[0] or 0 for m in memory)
+            pss = sum(m[1] or 0 for m in memory)
+
+        rate = len(texts) / elapsed
+        speedup = rate / results[0]["texts_per_s"] if results else 1.0
+        results.append({"workers": workers, "texts_per_s": round(rate, 1), "speedup": round(speedup, 2),
+                        "efficiency": round(speedup / workers, 2),
+                        "worker_rss_mb": round(rss, 1), "worker_pss_mb": round(pss, 1)})
+        print(f"{workers:>8} {rate:>10.1f} {speedup:>8.2f} {speedup / workers:>7.2f} {rss:>14.1f} {pss:>14.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+
+import nltk
+
+import synthetic_corpus
+import tag_recommender
+from tag_recommender import get_lemmatizer, get_stop_words, preprocess_text, punctuation
+
+
+def make_corpus(size, seed=0):
+    return [f"{title} {description}" for title, description in synthetic_corpus.make_questions(size, seed=seed)]
+
+
+def legacy_preprocess_text(text):
+    """preprocess_text as it was before tokenization and lemmatization were memoized"""
+    lemmatizer = get_lemmatizer()
+    stop_words = get_stop_words()
+    text = text.lower()
+    text = ''.join([char for char in text if char not in punctuation])
+    tokens = nltk.word_tokenize(text)
+    tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    tokens = [token for token in tokens if token not in stop_words and len(token) > 2]
+    return ' '.join(tokens)
+
+
+def measure(fn, corpus, tokens):
+    start = time.perf_counter()
+    outputs = [fn(text) for text in corpus]
+    elapsed = time.perf_counter() - start
+    return outputs, tokens / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure preprocess_text tokens per second before and after memoization")
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.questions)
+    tokens = sum(len(text.split()) for text in corpus)
+    get_lemmatizer()  # Keep corpus loading out of both measurements
+
+    legacy, legacy_rate = measure(legacy_preprocess_text, corpus, tokens)
+    tag_recommender.clear_preprocess_cache()
+    memoized, memoized_rate = measure(preprocess_text, corpus, tokens)
+    if legacy != memoized:
+        raise SystemExit("Memoized preprocess_text output differs from the legacy implementation")
+
+    results = {
+        "questions": args.questions,
+        "tokens": tokens,
+        "legacy_tokens_per_s": round(legacy_rate),
+        "memoized_tokens_per_s": round(memoized_rate),
+        "speedup": round(memoized_rate / legacy_rate, 2),
+        "cache": tag_recommender.preprocess_cache_stats()
+    }
+    print(f"{'legacy':<10} {results['legacy_tokens_per_s']:>12,} tokens/s")
+    print(f"{'memoized':<10} {results['memoized_tokens_per_s']:>12,} tokens/s  ({results['speedup']}x)")
+    for name, stats in results["cache"].items():
+        print(f"  {name:<10} hit rate {stats['hit_rate']:.1%} ({stats['size']} entries)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
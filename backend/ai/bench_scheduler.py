@@ -0,0 +1,73 @@
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+
+from moderation_bot import ToxicityChecker
+from toxicity_scheduler import ToxicityScheduler
+
+COMMENTS = [
+    "This is a perfectly normal comment.",
+    "I respectfully disagree with your opinion.",
+    "Your question is very dumb. how are you not in playschool?",
+    "Thanks, storing the token in an httpOnly cookie fixed it!",
+    "You're an idiot who shouldn't be allowed to post here!",
+]
+
+
+def run(check, threads, requests_per_thread):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = []
+        for i in range(requests_per_thread):
+            # Unique suffixes keep repeated comments from being deduplicated
+            text = f"{rng.choice(COMMENTS)} #{seed}-{i}"
+            start = time.perf_counter()
+            check(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return len(latencies) / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Direct check_toxicity calls vs ToxicityScheduler under concurrent load")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per thread")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    checker = ToxicityChecker(backend=args.backend)
+    checker.check_toxicity("warmup")
+
+    print(f"{'mode':<10} {'texts/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    rate, p50, p99 = run(checker.check_toxicity, args.threads, args.requests)
+    print(f"{'direct':<10} {rate:>10.1f} {p50:>10.1f} {p99:>10.1f}")
+
+    with ToxicityScheduler(checker, args.max_batch_size, args.max_wait_ms / 1000) as scheduler:
+        rate, p50, p99 = run(scheduler.check, args.threads, args.requests)
+        print(f"{'scheduled':<10} {rate:>10.1f} {p50:>10.1f} {p99:>10.1f}")
+        stats = scheduler.stats()
+    print(f"queue wait p50 {stats['queue_wait_p50'] * 1000:.1f} ms, p99 {stats['queue_wait_p99'] * 1000:.1f} ms, "
+          f"mean batch {stats['mean_batch_size']:.1f}")
+    print(f"batch sizes: {stats['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
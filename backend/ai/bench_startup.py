@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Each measurement runs in a fresh interpreter so nothing is already imported or cached
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import tag_recommender
+print(time.perf_counter() - start)
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import time
+start = time.perf_counter()
+import tag_recommender
+imported = time.perf_counter()
+tag_recommender.recommend_tags(
+    "How do I protect API routes using JWT in a React app?",
+    "Users log in via a form and receive a JWT. How should I store the token?",
+    ["React", "JWT", "Authentication", "Node.js"]
+)
+done = time.perf_counter()
+print(imported - start, done - imported)
+"""
+
+WARMUP_SNIPPET = """
+import json
+import tag_recommender
+print(json.dumps(tag_recommender.warmup()))
+"""
+
+
+def run(snippet):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=here, check=True,
+                            capture_output=True, text=True).stdout
+    return output.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tag_recommender import and first-request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    import_times, first_request = [], []
+    for _ in range(args.runs):
+        import_times.append(float(run(IMPORT_SNIPPET)))
+        first_request.append(sum(float(x) for x in run(FIRST_REQUEST_SNIPPET).split()))
+    warmup = json.loads(run(WARMUP_SNIPPET))
+
+    results = {
+        "import_s": round(min(import_times), 3),
+        "time_to_first_recommendation_s": round(min(first_request), 3),
+        "warmup_s": {name: round(seconds, 3) for name, seconds in warmup.items()}
+    }
+    print(f"import:                     {results['import_s']:.3f}s")
+    print(f"time to first recommendation: {results['time_to_first_recommendation_s']:.3f}s")
+    for name, seconds in results["warmup_s"].items():
+        print(f"  warmup {name:<20} {seconds:.3f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
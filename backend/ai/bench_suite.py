@@ -0,0 +1,202 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import synthetic_corpus
+
+
+def summarize_latencies(name, latencies, elapsed, items=None, **params):
+    """Common result record: ops/s, latency percentiles and this process's peak RSS"""
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    result = {
+        "name": name,
+        "params": params,
+        "ops": len(latencies),
+        "ops_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    if items is not None:
+        result["items_per_s"] = round(items / elapsed, 2)
+    return result
+
+
+def timed_calls(fn, inputs):
+    latencies = []
+    start = time.perf_counter()
+    for value in inputs:
+        call_start = time.perf_counter()
+        fn(value)
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+
+def bench_check_toxicity(args):
+    from moderation_bot import ToxicityChecker
+
+    checker = ToxicityChecker(backend=args.backend)
+    comments = synthetic_corpus.make_comments(args.size, args.comment_words, args.distribution, seed=args.seed)
+    checker.check_toxicity(comments[0])  # warmup
+    latencies, elapsed = timed_calls(checker.check_toxicity, comments)
+    return [summarize_latencies("moderation.check_toxicity", latencies, elapsed, backend=args.backend)]
+
+
+def bench_batch_check(args):
+    from moderation_bot import ToxicityChecker
+
+    checker = ToxicityChecker(backend=args.backend)
+    comments = synthetic_corpus.make_comments(args.size, args.comment_words, args.distribution, seed=args.seed)
+    checker.batch_check(comments[:args.batch_size])  # warmup
+
+    results = []
+    for batch_size in args.batch_sizes:
+        batches = [comments[i:i + batch_size] for i in range(0, len(comments), batch_size)]
+        latencies, elapsed = timed_calls(lambda batch: checker.batch_check(batch, batch_size=batch_size), batches)
+        results.append(summarize_latencies("moderation.batch_check", latencies, elapsed, items=len(comments),
+                                           backend=args.backend, batch_size=batch_size))
+    return results
+
+
+def bench_recommend_tags(args):
+    import tag_recommender
+
+    tag_recommender.warmup()
+    questions = synthetic_corpus.make_questions(args.size, args.question_words, args.distribution, seed=args.seed)
+    results = []
+    for catalog_size in args.catalog_sizes:
+        tags = synthetic_corpus.make_tags(catalog_size, seed=args.seed)
+        latencies, elapsed = timed_calls(
+            lambda question: tag_recommender.recommend_tags(question[0], question[1], tags), questions)
+        results.append(summarize_latencies("tags.recommend_tags", latencies, elapsed, catalog_size=catalog_size))
+    return results
+
+
+def bench_batch_summarize(args):
+    from answer_summarizer import GeminiFlashSummarizer
+    from fake_gemini import FakeGenerativeModel
+
+    answers = synthetic_corpus.make_answers(args.size, args.answer_words, args.distribution, seed=args.seed)
+    model = FakeGenerativeModel(latency=args.fake_latency, jitter=args.fake_latency / 5, seed=args.seed)
+    summarizer = GeminiFlashSummarizer(model=model)
+    batches = [answers[i:i + args.batch_size] for i in range(0, len(answers), args.batch_size)]
+    latencies, elapsed = timed_calls(
+        lambda batch: summarizer.batch_summarize(batch, max_length=200, batch_size=args.summarize_in_flight), batches)
+    return [summarize_latencies("summarizer.batch_summarize", latencies, elapsed, items=len(answers),
+                                fake_latency_s=args.fake_latency, in_flight=args.summarize_in_flight)]
+
+
+BENCHMARKS = {
+    "check_toxicity": bench_check_toxicity,
+    "batch_check": bench_batch_check,
+    "recommend_tags": bench_recommend_tags,
+    "batch_summarize": bench_batch_summarize
+}
+
+
+def run_isolated(name, args):
+    """Run one benchmark in a fresh process so peak RSS and warm caches don't leak between them"""
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(BENCHMARKS[name], (args,))
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def result_key(result):
+    return result["name"] + "".join(f" {k}={v}" for k, v in sorted(result["params"].items()))
+
+
+def compare(baseline_path, results, tolerance):
+    """
+    Print the change of every metric against an earlier run.
+
+    Returns:
+        Keys of results whose throughput dropped or p99 rose by more than tolerance (a fraction)
+    """
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n{'benchmark':<60} {'ops/s':>18} {'p99 ms':>18}")
+    for result in results:
+        key = result_key(result)
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<60} {'(new)':>18}")
+            continue
+        ops_change = result["ops_per_s"] / old["ops_per_s"] - 1
+        p99_change = result["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        flag = ""
+        if ops_change < -tolerance or p99_change > tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<60} {ops_change:>+17.1%} {p99_change:>+17.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the AI pipeline")
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--size", type=int, default=500, help="Documents per synthetic corpus")
+    parser.add_argument("--distribution", default="lognormal", choices=["lognormal", "uniform", "fixed"])
+    parser.add_argument("--comment-words", type=float, default=20, help="Mean comment length in words")
+    parser.add_argument("--question-words", type=float, default=60)
+    parser.add_argument("--answer-words", type=float, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="torch", help="ToxicityChecker backend")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64],
+                        help="batch_check sizes to sweep")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Tag catalog sizes for recommend_tags")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="Simulated seconds per model call")
+    parser.add_argument("--summarize-in-flight", type=int, default=8)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change counted as a regression by --compare")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'benchmark':<60} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for name in args.benchmarks:
+        for result in run_isolated(name, args):
+            results.append(result)
+            print(f"{result_key(result):<60} {result['ops_per_s']:>10} {result['p50_ms']:>9} "
+                  f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['peak_rss_mb']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"environment": environment(), "config": vars(args), "results": results}, f, indent=2)
+
+    if args.compare and compare(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
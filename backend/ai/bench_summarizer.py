@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from answer_summarizer import GeminiFlashSummarizer
+from fake_gemini import FakeGenerativeModel
+
+sample_answer = """
+You need to send the JWT with every request to a protected route. After login, keep the
+token in memory or an httpOnly cookie rather than localStorage, then add it to the
+Authorization header as a Bearer token. On the server, verify the signature and expiry in
+a middleware before the route handler runs, and return 401 when verification fails.
+"""
+
+
+def run(max_in_flight, args):
+    model = FakeGenerativeModel(latency=args.latency, jitter=args.latency / 5,
+                                failure_rate=args.failure_rate, seed=1)
+    summarizer = GeminiFlashSummarizer(model=model, requests_per_minute=args.rpm,
+                                       tokens_per_minute=args.tpm)
+    texts = [f"Answer {i}:\n{sample_answer}" for i in range(args.items)]
+
+    start = time.perf_counter()
+    results = summarizer.batch_summarize(texts, max_length=200, batch_size=max_in_flight)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for r in results if r.get("error"))
+    print(f"{max_in_flight:>10} {elapsed:>10.2f} {args.items / elapsed:>10.2f} "
+          f"{model.max_in_flight:>12} {model.calls:>7} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch_summarize throughput with a fake model")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per model call")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute limit")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute limit")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 5, 10, 20])
+    args = parser.parse_args()
+
+    print(f"{'in flight':>10} {'seconds':>10} {'items/s':>10} {'peak conc.':>12} {'calls':>7} {'errors':>7}")
+    for max_in_flight in args.in_flight:
+        run(max_in_flight, args)
+
+
+if __name__ == "__main__":
+    main()
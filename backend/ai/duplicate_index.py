@@ -0,0 +1,307 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from tag_recommender import get_kw_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DuplicateIndex:
+    def __init__(self, embedder=None, num_bits: int = 12, num_tables: int = 16, probes: int = 2,
+                 brute_force_below: int = 5000, seed: int = 0):
+        """
+        Near-duplicate search over existing questions.
+
+        Each question (title + description) is embedded once with the KeyBERT
+        sentence model and stored L2-normalized as float16. Queries use
+        random-hyperplane LSH: every table hashes a vector to num_bits sign
+        bits, candidates are the questions sharing a bucket in any table
+        (plus buckets one uncertain bit away), and only those are scored
+        exactly. Questions on one forum point in similar directions, so the
+        hyperplanes pass through the mean vector rather than the origin to
+        keep buckets balanced. Small indexes are scanned exhaustively; the
+        hash tables are built once the index reaches brute_force_below.
+
+        Args:
+            embedder: Object with embed(List[str]) -> np.ndarray; defaults to the KeyBERT sentence model
+            num_bits: Hyperplanes per table (more bits, smaller buckets)
+            num_tables: Independent hash tables (more tables, higher recall)
+            probes: Extra buckets probed per table by flipping the least certain bits
+            brute_force_below: Scan every vector while the index is smaller than this
+            seed: Seed for the hyperplanes (must match between save and load)
+        """
+        self.embedder = embedder or get_kw_model().model
+        self.num_bits = num_bits
+        self.num_tables = num_tables
+        self.probes = probes
+        self.brute_force_below = brute_force_below
+        self.seed = seed
+
+        self.ids = []
+        self._rows = {}
+        self._matrix = None  # capacity x dim float16, only the first len(self.ids) rows are used
+        self._codes = None  # capacity x num_tables bucket codes
+        self._planes = None  # num_tables x num_bits x dim, created once the dimension is known
+        self._center = None  # Mean vector the hyperplanes pass through; None until the tables are built
+        self._buckets = [defaultdict(list) for _ in range(num_tables)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, question_id) -> bool:
+        return question_id in self._rows
+
+    @staticmethod
+    def _question_text(title: str, description: str) -> str:
+        return f"{title}. {description}".strip()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts and L2-normalize the rows"""
+        vectors = np.asarray(self.embedder.embed(texts), dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _ensure_planes(self, dim: int) -> None:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.num_tables, self.num_bits, dim)).astype(np.float32)
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """Signed distances to every hyperplane: n x num_tables x num_bits"""
+        return np.einsum('nd,tbd->ntb', vectors - self._center, self._planes)
+
+    def _hash(self, projections: np.ndarray) -> np.ndarray:
+        weights = 1 << np.arange(self.num_bits, dtype=np.int64)
+        return (projections > 0).astype(np.int64) @ weights
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        """Grow the arrays geometrically and make them writable before a change"""
+        current = self._matrix
+        if current is not None and current.flags.writeable and rows <= current.shape[0]:
+            return
+
+        capacity = max(rows, 16)
+        if current is not None:
+            # Doubling keeps repeated inserts amortized O(1); a read-only memory map is copied as is
+            capacity = max(capacity, current.shape[0] * 2 if rows > current.shape[0] else current.shape[0])
+        matrix = np.empty((capacity, dim), dtype=np.float16)
+        codes = np.empty((capacity, self.num_tables), dtype=np.int64)
+        if current is not None:
+            matrix[:len(self.ids)] = current[:len(self.ids)]
+            codes[:len(self.ids)] = self._codes[:len(self.ids)]
+        self._matrix = matrix
+        self._codes = codes
+
+    def add(self, questions: Iterable[Tuple[object, str, str]]) -> int:
+        """
+        Embed and insert questions that are not in the index yet.
+
+        Args:
+            questions: (question_id, title, description) tuples
+
+        Returns:
+            Number of questions added
+        """
+        new = {}
+        for question_id, title, description in questions:
+            if question_id not in self._rows and question_id not in new:
+                new[question_id] = self._question_text(title, description)
+        if not new:
+            return 0
+
+        vectors = self._embed(list(new.values()))
+        with self._lock:
+            start = len(self.ids)
+            self._ensure_capacity(start + len(new), vectors.shape[1])
+            self._matrix[start:start + len(new)] = vectors
+            self.ids.extend(new)
+            for offset, question_id in enumerate(new):
+                self._rows[question_id] = start + offset
+
+            if self._center is not None:
+                codes = self._hash(self._project(vectors))
+                self._codes[start:start + len(new)] = codes
+                self._index_rows(start, codes)
+            elif len(self.ids) >= self.brute_force_below:
+                self._build_tables()
+        return len(new)
+
+    def _index_rows(self, start: int, codes: np.ndarray) -> None:
+        for table in range(self.num_tables):
+            buckets = self._buckets[table]
+            for row, code in enumerate(codes[:, table].tolist(), start):
+                buckets[code].append(row)
+
+    def _build_tables(self, chunk_size: int = 8192) -> None:
+        """Center the hyperplanes on the current vectors and hash every row"""
+        size, dim = len(self.ids), self._matrix.shape[1]
+        self._ensure_planes(dim)
+        total = np.zeros(dim, dtype=np.float64)
+        for start in range(0, size, chunk_size):
+            total += self._matrix[start:min(start + chunk_size, size)].astype(np.float32).sum(axis=0)
+        self._center = (total / max(size, 1)).astype(np.float32)
+
+        self._buckets = [defaultdict(list) for _ in range(self.num_tables)]
+        for start in range(0, size, chunk_size):
+            chunk = self._matrix[start:min(start + chunk_size, size)].astype(np.float32)
+            codes = self._hash(self._project(chunk))
+            self._codes[start:start + len(codes)] = codes
+            self._index_rows(start, codes)
+        logger.info(f"Built {self.num_tables} LSH tables over {size} questions")
+
+    def rebuild(self) -> None:
+        """Re-center and re-hash everything, e.g. after the mix of questions has drifted"""
+        with self._lock:
+            if self.ids:
+                self._ensure_capacity(len(self.ids), self._matrix.shape[1])
+                self._build_tables()
+
+    def remove(self, question_ids: Iterable) -> int:
+        """
+        Remove questions by moving the last row into each freed slot.
+
+        Returns:
+            Number of questions removed
+        """
+        removed = 0
+        with self._lock:
+            for question_id in question_ids:
+                row = self._rows.pop(question_id, None)
+                if row is None:
+                    continue
+                self._ensure_capacity(len(self.ids), self._matrix.shape[1])
+                last = len(self.ids) - 1
+                hashed = self._center is not None
+                if hashed:
+                    for table in range(self.num_tables):
+                        self._buckets[table][int(self._codes[row, table])].remove(row)
+                if row != last:
+                    moved = self.ids[last]
+                    if hashed:
+                        for table in range(self.num_tables):
+                            bucket = self._buckets[table][int(self._codes[last, table])]
+                            bucket[bucket.index(last)] = row
+                    self._matrix[row] = self._matrix[last]
+                    self._codes[row] = self._codes[last]
+                    self.ids[row] = moved
+                    self._rows[moved] = row
+                self.ids.pop()
+                removed += 1
+        return removed
+
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        """Rows sharing a bucket with the query in any table, including nearby buckets"""
+        projections = self._project(vector.reshape(1, -1))[0]
+        codes = self._hash(projections[None])[0]
+        # Multi-probe: also visit the buckets reached by flipping the bits closest to their hyperplane
+        uncertain = np.argsort(np.abs(projections), axis=1)[:, :self.probes]
+        rows = []
+        for table in range(self.num_tables):
+            buckets = self._buckets[table]
+            code = int(codes[table])
+            rows.extend(buckets.get(code, ()))
+            for bit in uncertain[table]:
+                rows.extend(buckets.get(code ^ (1 << int(bit)), ()))
+        return np.unique(np.array(rows, dtype=np.int64))
+
+    def top_k(self, vector: np.ndarray, k: int = 5, threshold: float = 0.0,
+              exact: bool = False) -> List[Tuple[object, float]]:
+        """
+        Most similar questions to a normalized query vector.
+
+        Returns:
+            List of (question_id, cosine similarity) pairs, best first
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            size = len(self.ids)
+            if size == 0:
+                return []
+            if exact or self._center is None:
+                rows = np.arange(size)
+                scores = self._matrix[:size].astype(np.float32) @ vector
+            else:
+                rows = self._candidates(vector)
+                if len(rows) == 0:
+                    return []
+                scores = self._matrix[rows].astype(np.float32) @ vector
+            ids = [self.ids[row] for row in rows] if len(rows) < size else list(self.ids)
+
+        k = min(k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(ids[i], float(scores[i])) for i in best if scores[i] >= threshold]
+
+    def similar(self, title: str, description: str, k: int = 5, threshold: float = 0.8,
+                exclude=None) -> List[Tuple[object, float]]:
+        """
+        Existing questions that look like duplicates of a new one.
+
+        Args:
+            title: Question title
+            description: Question body
+            k: Most results to return
+            threshold: Minimum cosine similarity
+            exclude: Question id to leave out (e.g. the question itself when re-checking)
+        """
+        vector = self._embed([self._question_text(title, description)])[0]
+        matches = self.top_k(vector, k + (exclude is not None), threshold)
+        return [(question_id, score) for question_id, score in matches if question_id != exclude][:k]
+
+    def save(self, path: str) -> None:
+        """Write the index to path.npy (vectors), path.codes.npy (LSH codes) and path.json (ids, settings)"""
+        with self._lock:
+            size = len(self.ids)
+            matrix = self._matrix[:size] if self._matrix is not None else np.empty((0, 0), dtype=np.float16)
+            np.save(f"{path}.npy", np.ascontiguousarray(matrix))
+            if self._center is not None:
+                np.save(f"{path}.codes.npy", np.ascontiguousarray(self._codes[:size]))
+            with open(f"{path}.json", 'w') as f:
+                json.dump({"ids": self.ids, "num_bits": self.num_bits, "num_tables": self.num_tables,
+                           "seed": self.seed,
+                           "center": self._center.tolist() if self._center is not None else None}, f)
+        logger.info(f"Saved duplicate index with {size} questions to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, embedder=None, **kwargs) -> 'DuplicateIndex':
+        """
+        Load an index written by save().
+
+        Args:
+            path: Path prefix passed to save()
+            mmap: Memory-map the vectors read-only instead of reading them into memory
+            embedder: Embedder for queries and later inserts (defaults to the KeyBERT model)
+            kwargs: Query settings such as probes or brute_force_below
+        """
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        index = cls(embedder=embedder, num_bits=meta["num_bits"], num_tables=meta["num_tables"],
+                    seed=meta["seed"], **kwargs)
+        # JSON turns tuple ids into lists; keep them hashable
+        index.ids = [tuple(i) if isinstance(i, list) else i for i in meta["ids"]]
+        index._rows = {question_id: row for row, question_id in enumerate(index.ids)}
+
+        matrix = np.load(f"{path}.npy", mmap_mode='r' if mmap else None)
+        if matrix.size:
+            index._matrix = matrix
+            index._codes = np.empty((len(matrix), index.num_tables), dtype=np.int64)
+            if meta["center"] is not None:
+                # Stored codes spare re-projecting every vector; only the buckets are rebuilt
+                index._codes[:] = np.load(f"{path}.codes.npy")
+                index._center = np.array(meta["center"], dtype=np.float32)
+                index._ensure_planes(matrix.shape[1])
+                index._index_rows(0, index._codes)
+            elif len(index.ids) >= index.brute_force_below:
+                index._ensure_capacity(len(index.ids), matrix.shape[1])
+                index._build_tables()
+        return index
@@ -0,0 +1,70 @@
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.1,
+                 failure_rate: float = 0.0, seed: Optional[int] = 0):
+        """
+        Offline stand-in for genai.GenerativeModel used in tests and benchmarks.
+
+        Responses are built from the leading sentences of the prompt's original
+        text, after a simulated network latency.
+
+        Args:
+            latency: Mean seconds per generate_content call
+            jitter: Maximum random deviation from the mean latency, in seconds
+            failure_rate: Probability that a call raises a simulated transient error
+            seed: Seed for latency and failure randomness (None for nondeterministic)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        return delay, fail
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None) -> FakeResponse:
+        delay, fail = self._draw()
+        try:
+            time.sleep(delay)
+            if fail:
+                with self._lock:
+                    self.failures += 1
+                raise RuntimeError("Simulated transient model failure")
+
+            # Summarize by keeping the first sentences of the text being summarized
+            match = re.search(r"\*\*Original Text:\*\*(.*?)(\*\*Summary Requirements|\Z)", prompt, re.S)
+            source = match.group(1) if match else prompt
+            max_tokens = (generation_config or {}).get("max_output_tokens", 256)
+            sentences = re.split(r"(?<=[.!?])\s+", " ".join(source.split()))
+            summary = ""
+            for sentence in sentences:
+                if len(summary) + len(sentence) > max_tokens * 4:
+                    break
+                summary = f"{summary} {sentence}".strip()
+            return FakeResponse(summary or source.strip()[:max_tokens * 4])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
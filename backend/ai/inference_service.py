@@ -0,0 +1,336 @@
+import argparse
+import json
+import logging
+import os
+import socketserver
+import time
+from collections import defaultdict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import instrumentation
+from micro_batcher import MicroBatcher, QueueFullError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class RequestTooLargeError(ValueError):
+    """Raised when one request holds more items than a model queue can take"""
+
+
+def _grouped(items: List[Tuple], run: Callable[[Any, List], List]) -> List:
+    """
+    Run a batch API once per distinct option set.
+
+    Items are (options, payload) pairs; run(options, payloads) returns one
+    result per payload. Results come back in item order. A group that fails
+    gets its exception as the result of each of its items, so other
+    requests in the same batch are unaffected.
+    """
+    results = [None] * len(items)
+    groups = defaultdict(list)
+    for index, (options, _) in enumerate(items):
+        try:
+            groups[options].append(index)
+        except TypeError as e:  # Unhashable options
+            results[index] = e
+
+    for options, indices in groups.items():
+        try:
+            group_results = run(options, [items[i][1] for i in indices])
+        except Exception as e:
+            logger.error(f"Batch of {len(indices)} items failed: {str(e)}")
+            group_results = [e] * len(indices)
+        for index, result in zip(indices, group_results):
+            results[index] = result
+    return results
+
+
+class InferenceService:
+    def __init__(self, checker=None, summarizer=None, tag_recommender=None,
+                 max_batch_size: int = 32, max_wait: float = 0.01, max_queue: int = 256,
+                 summarizer_workers: int = 4, request_timeout: float = 60.0, tag_index=None):
+        """
+        Long-lived host for the AI modules, each loaded once.
+
+        Concurrent requests for the same model are micro-batched: they wait up
+        to max_wait for company and are then sent through the module's batch
+        API together. Every model has a bounded queue; when it is full,
+        requests are rejected instead of piling up.
+
+        Args:
+            checker: ToxicityChecker for /moderate (None disables the endpoint)
+            summarizer: GeminiFlashSummarizer (or compatible) for /summarize
+            tag_recommender: Module or object with recommend_tags_batch for /tags
+            max_batch_size: Most requests combined into one batch call
+            max_wait: Seconds a batch waits for more requests
+            max_queue: Requests allowed to wait per model before rejecting
+            summarizer_workers: Summary batches in flight at once (summaries are I/O bound)
+            request_timeout: Seconds a request may wait for its result
+            tag_index: TagIndex over the tag catalog; /tags then ranks tags by embedding
+                similarity and available_tags becomes optional
+        """
+        self.checker = checker
+        self.summarizer = summarizer
+        self.tag_recommender = tag_recommender
+        self.tag_index = tag_index
+        self.request_timeout = request_timeout
+        self.batchers = {}
+
+        if checker is not None:
+            self.batchers["moderate"] = MicroBatcher(
+                self._moderate_batch, max_batch_size, max_wait, max_queue, name="moderate")
+        if summarizer is not None:
+            self.batchers["summarize"] = MicroBatcher(
+                self._summarize_batch, max_batch_size, max_wait, max_queue,
+                workers=summarizer_workers, name="summarize")
+        if tag_recommender is not None:
+            self.batchers["tags"] = MicroBatcher(
+                self._tags_batch, max_batch_size, max_wait, max_queue, name="tags")
+
+    def _moderate_batch(self, items: List[Tuple]) -> List[Dict]:
+        return _grouped(items, lambda threshold, texts: self.checker.batch_check(texts, threshold))
+
+    def _summarize_batch(self, items: List[Tuple]) -> List[Dict]:
+        return _grouped(items, lambda max_length, texts: self.summarizer.batch_summarize(
+            texts, max_length=max_length, batch_size=len(texts)))
+
+    def _tags_batch(self, items: List[Tuple]) -> List[List[str]]:
+        def run(options, questions):
+            available_tags, top_n, threshold = options
+            return list(self.tag_recommender.recommend_tags_batch(
+                questions, list(available_tags) if available_tags is not None else None,
+                top_n=top_n, threshold=threshold, batch_size=len(questions), index=self.tag_index))
+        return _grouped(items, run)
+
+    def _call(self, endpoint: str, options, payload):
+        return self.batchers[endpoint].submit((options, payload)).result(self.request_timeout)
+
+    def moderate(self, body: Dict) -> Dict:
+        threshold = body.get("threshold")
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except (TypeError, ValueError):
+                raise ValueError("'threshold' must be a number")
+        if "texts" in body:
+            if not isinstance(body["texts"], list):
+                raise ValueError("'texts' must be a list of strings")
+            batcher = self.batchers["moderate"]
+            if 0 < batcher.max_queue < len(body["texts"]):
+                # Such a request could never be queued whole, so retrying it is pointless
+                raise RequestTooLargeError(f"'texts' holds {len(body['texts'])} items; "
+                                           f"at most {batcher.max_queue} are accepted per request")
+            futures = []
+            try:
+                for text in body["texts"]:
+                    futures.append(batcher.submit((threshold, text)))
+                # One deadline for the whole request, not request_timeout per text
+                deadline = time.monotonic() + self.request_timeout
+                results = [future.result(max(deadline - time.monotonic(), 0.0)) for future in futures]
+            except Exception:
+                # Don't leave the rest of a rejected or abandoned request queued
+                for future in futures:
+                    future.cancel()
+                raise
+            return {"results": results}
+        return self._call("moderate", threshold, body.get("text"))
+
+    def summarize(self, body: Dict) -> Dict:
+        text = body.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("'text' must be a non-empty string")
+        try:
+            max_length = int(body.get("max_length", 300))
+        except (TypeError, ValueError):
+            raise ValueError("'max_length' must be an integer")
+        return self._call("summarize", max_length, text)
+
+    def tags(self, body: Dict) -> Dict:
+        available_tags = body.get("available_tags")
+        if available_tags is None and self.tag_index is not None:
+            pass  # Rank against the whole index
+        elif (not isinstance(available_tags, list) or not available_tags
+                or not all(isinstance(tag, str) for tag in available_tags)):
+            raise ValueError("'available_tags' must be a non-empty list of strings")
+        question = (body.get("title", ""), body.get("description", ""))
+        if not all(isinstance(part, str) for part in question):
+            raise ValueError("'title' and 'description' must be strings")
+        try:
+            options = (tuple(available_tags) if available_tags is not None else None,
+                       int(body.get("top_n", 15)), float(body.get("threshold", 0.2)))
+        except (TypeError, ValueError):
+            raise ValueError("'top_n' and 'threshold' must be numbers")
+        return {"tags": self._call("tags", options, question)}
+
+    def stats(self) -> Dict:
+        stats = {name: batcher.stats() for name, batcher in self.batchers.items()}
+        if instrumentation.is_enabled():
+            stats["instrumentation"] = instrumentation.snapshot()
+        return stats
+
+    def close(self) -> None:
+        for batcher in self.batchers.values():
+            batcher.close()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    service: InferenceService = None
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        # Unix socket peers have no host/port
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None,
+              content_type: str = "application/json") -> None:
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "endpoints": sorted(self.service.batchers)})
+        elif self.path == "/stats":
+            self._send(200, self.service.stats())
+        elif self.path == "/metrics":
+            self._send(200, instrumentation.prometheus_text(), content_type="text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        endpoint = self.path.strip("/")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body can't be delimited, so the connection can't be reused either
+            self.close_connection = True
+            self._send(400, {"error": "Invalid Content-Length header"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, {"error": "Request body too large"})
+            return
+        raw = self.rfile.read(length)
+
+        if endpoint not in self.service.batchers:
+            self._send(404, {"error": f"Unknown or disabled endpoint /{endpoint}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object")
+            result = getattr(self.service, endpoint)(body)
+        except RequestTooLargeError as e:
+            self._send(413, {"error": str(e)})
+            return
+        except QueueFullError as e:
+            self._send(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        except FutureTimeoutError:
+            self._send(504, {"error": "Timed out waiting for the model"})
+            return
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error(f"/{endpoint} failed: {str(e)}")
+            self._send(500, {"error": str(e)})
+            return
+        logger.debug(f"/{endpoint} served in {time.perf_counter() - start:.4f}s")
+        self._send(200, result)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections under bursts of clients
+    request_queue_size = 128
+
+
+def make_server(service: InferenceService, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Optional[str] = None):
+    """Create a threaded HTTP server for the service on a TCP port or a Unix socket"""
+    handler = type("BoundInferenceRequestHandler", (InferenceRequestHandler,), {"service": service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        return UnixHTTPServer(unix_socket, handler)
+    return TCPHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve moderation, summarization and tag recommendation over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--model-type", default="original", help="Detoxify model type")
+    parser.add_argument("--backend", default="torch", help="ToxicityChecker backend")
+    parser.add_argument("--fake-summarizer", action="store_true",
+                        help="Use the offline fake Gemini model (for load tests)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Record per-stage timings (served on /metrics and /stats)")
+    parser.add_argument("--tag-index", help="Path prefix of a saved TagIndex to rank /tags with")
+    parser.add_argument("--disable", nargs="*", default=[], choices=["moderate", "summarize", "tags"])
+    args = parser.parse_args()
+    if args.metrics:
+        instrumentation.enable()
+
+    checker = summarizer = tag_recommender = tag_index = None
+    if "moderate" not in args.disable:
+        from moderation_bot import ToxicityChecker
+        checker = ToxicityChecker(model_type=args.model_type, backend=args.backend)
+    if "summarize" not in args.disable:
+        from answer_summarizer import GeminiFlashSummarizer
+        if args.fake_summarizer:
+            from fake_gemini import FakeGenerativeModel
+            summarizer = GeminiFlashSummarizer(model=FakeGenerativeModel())
+        else:
+            summarizer = GeminiFlashSummarizer()
+    if "tags" not in args.disable:
+        import tag_recommender
+        tag_recommender.warmup()
+        if args.tag_index:
+            from tag_index import TagIndex
+            tag_index = TagIndex.load(args.tag_index)
+
+    service = InferenceService(checker, summarizer, tag_recommender,
+                               max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000,
+                               max_queue=args.max_queue, tag_index=tag_index)
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    logger.info(f"Serving {sorted(service.batchers)} on {args.unix_socket or f'{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, Optional, Sequence
+
+# Opt-in: set VERITA_METRICS=1 or call enable(). While disabled, timer() hands
+# back a shared no-op context manager and increment()/observe() return at once.
+_enabled = os.environ.get('VERITA_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = nullcontext()
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Fixed-bucket latency histogram with Prometheus semantics"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)}
+        }
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def timer(stage: str):
+    """
+    Context manager recording the wrapped block's duration under stage.
+
+    Example:
+        with instrumentation.timer("moderation.predict"):
+            scores = model.predict(texts)
+    """
+    return _Timer(stage) if _enabled else _NULL_TIMER
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record one duration for stage"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+
+def increment(event: str, amount: float = 1) -> None:
+    """Add to a counter such as "moderation.cache_hit" or "summarizer.retry" """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[event] = _counters.get(event, 0) + amount
+
+
+def snapshot() -> Dict:
+    """Current histograms and counters as plain dicts"""
+    with _lock:
+        return {
+            "stages": {stage: histogram.to_dict() for stage, histogram in sorted(_histograms.items())},
+            "counters": dict(sorted(_counters.items()))
+        }
+
+
+def dump_json(path: Optional[str] = None) -> str:
+    """Serialize snapshot() as JSON, optionally writing it to path"""
+    text = json.dumps(snapshot(), indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+
+def prometheus_text(prefix: str = 'verita') -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent per processing stage",
+        f"# TYPE {prefix}_stage_seconds histogram"
+    ]
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append(f"# HELP {prefix}_events_total Counted events such as cache hits, retries and errors")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for event, value in sorted(_counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{event}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Drop all recorded metrics"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,114 @@
+import argparse
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+SAMPLE_COMMENTS = [
+    "This is a perfectly normal comment.",
+    "I respectfully disagree with your opinion.",
+    "Your question is very dumb. how are you not in playschool?",
+    "Thanks, storing the token in an httpOnly cookie fixed it!",
+    "You're an idiot who shouldn't be allowed to post here!",
+]
+SAMPLE_ANSWER = (
+    "You need to send the JWT with every request to a protected route. After login, keep the "
+    "token in memory or an httpOnly cookie rather than localStorage, then add it to the "
+    "Authorization header as a Bearer token."
+)
+SAMPLE_TAGS = ["React", "JWT", "Authentication", "Token Storage", "API Security", "Node.js", "MongoDB"]
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 60.0):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def make_request(endpoint: str, rng: random.Random):
+    if endpoint == "moderate":
+        return {"text": rng.choice(SAMPLE_COMMENTS)}
+    if endpoint == "summarize":
+        return {"text": SAMPLE_ANSWER, "max_length": 200}
+    return {"title": "How do I protect API routes using JWT in a React app?",
+            "description": rng.choice(SAMPLE_COMMENTS), "available_tags": SAMPLE_TAGS}
+
+
+def worker(args, seed, deadline, latencies, statuses, lock):
+    rng = random.Random(seed)
+    connect = (lambda: UnixHTTPConnection(args.unix_socket)) if args.unix_socket else \
+        (lambda: http.client.HTTPConnection(args.host, args.port, timeout=60))
+    conn = connect()
+    while time.perf_counter() < deadline:
+        endpoint = rng.choice(args.endpoints)
+        body = json.dumps(make_request(endpoint, rng))
+        start = time.perf_counter()
+        try:
+            conn.request("POST", f"/{endpoint}", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = "connection error"
+            conn.close()
+            conn = connect()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[endpoint].append(elapsed)
+            statuses[status] += 1
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load generator for inference_service.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--endpoints", nargs="+", default=["moderate"], choices=["moderate", "summarize", "tags"])
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    latencies = {endpoint: [] for endpoint in args.endpoints}
+    statuses = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [threading.Thread(target=worker, args=(args, seed, deadline, latencies, statuses, lock))
+               for seed in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = {"concurrency": args.concurrency, "seconds": round(elapsed, 2),
+               "status_counts": {str(k): v for k, v in statuses.items()}, "endpoints": {}}
+    print(f"{'endpoint':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, samples in latencies.items():
+        if not samples:
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        results["endpoints"][endpoint] = {"requests": len(samples), "rps": round(len(samples) / elapsed, 1),
+                                          "p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+        print(f"{endpoint:<10} {len(samples):>9} {len(samples) / elapsed:>9.1f} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+    print(f"status codes: {dict(statuses)}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
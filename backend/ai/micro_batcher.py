@@ -0,0 +1,184 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFullError(RuntimeError):
+    """Raised by MicroBatcher.submit when the bounded queue is full"""
+
+
+class MicroBatcher:
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait: float = 0.01, max_queue: int = 1000, workers: int = 1,
+                 name: str = "batcher", wait_samples: int = 10000):
+        """
+        Collect concurrently submitted items into batches for a batch API.
+
+        A worker takes the first waiting item, then keeps collecting until the
+        batch is full or max_wait has passed since that item was taken, and
+        hands the batch to process_batch in one call.
+
+        Args:
+            process_batch: Function mapping a list of items to a list of results (same order);
+                an exception instance as a result fails only that item's future
+            max_batch_size: Most items handed to process_batch at once
+            max_wait: Seconds to wait for more items once a batch has started
+            max_queue: Most items waiting at once; submit() raises QueueFullError beyond it
+            workers: Number of batches processed concurrently
+            name: Used in thread names and log messages
+            wait_samples: Recent queue waits kept for the percentiles in stats()
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._waits = deque(maxlen=wait_samples)
+        self._batch_sizes = Counter()
+        self._counts = Counter()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __len__(self) -> int:
+        """Number of items waiting to be batched"""
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item without blocking.
+
+        Returns:
+            Future resolved with the item's result
+
+        Raises:
+            QueueFullError: When the queue is full (callers should shed load)
+        """
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self._counts["rejected"] += 1
+            raise QueueFullError(f"{self.name} queue is full ({self._queue.maxsize} items waiting)")
+        with self._stats_lock:
+            self._counts["submitted"] += 1
+        return future
+
+    def _collect(self, first) -> List:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                # Leave the stop marker for this worker's next loop
+                self._queue.put(entry)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            # Skip items whose callers have already given up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._process(batch)
+
+    def _process(self, batch: List) -> None:
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._waits.extend(started - enqueued for _, _, enqueued in batch)
+            self._batch_sizes[len(batch)] += 1
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {str(e)}")
+            with self._stats_lock:
+                self._counts["failed"] += len(batch)
+                self._counts["busy_time"] += time.perf_counter() - started
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        failed = sum(isinstance(result, Exception) for result in results)
+        with self._stats_lock:
+            self._counts["completed"] += len(batch) - failed
+            self._counts["failed"] += failed
+            self._counts["busy_time"] += time.perf_counter() - started
+        for (_, future, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        """
+        Queue, batching and throughput statistics since the batcher started.
+
+        Returns:
+            Dict with item counters, queue wait percentiles (seconds, over recent
+            items), a batch size histogram and completed items per second
+        """
+        with self._stats_lock:
+            waits = np.array(self._waits)
+            sizes = dict(sorted(self._batch_sizes.items()))
+            counts = dict(self._counts)
+        elapsed = time.perf_counter() - self._started
+        batches = sum(sizes.values())
+        p50, p99 = np.percentile(waits, [50, 99]) if len(waits) else (0.0, 0.0)
+        return {
+            "queued": len(self),
+            "submitted": counts.get("submitted", 0),
+            "rejected": counts.get("rejected", 0),
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "batches": batches,
+            "mean_batch_size": sum(size * n for size, n in sizes.items()) / batches if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "queue_wait_p50": float(p50),
+            "queue_wait_p99": float(p99),
+            "throughput": counts.get("completed", 0) / elapsed if elapsed else 0.0,
+            "busy_fraction": counts.get("busy_time", 0.0) / elapsed / len(self._threads) if elapsed else 0.0
+        }
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting items, finish the queued ones and join the workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
@@ -1,19 +1,190 @@
-from detoxify import Detoxify
-from typing import Dict, Union, List, Optional
+from typing import Dict, Iterable, Iterator, Union, List, Optional, Tuple
 import numpy as np
 import logging
 import re
+import string
+import time
+import ahocorasick
 import contractions
+import instrumentation
 from collections import defaultdict
+from itertools import islice
+from banned_word_matcher import BannedWordMatcher
+from result_cache import ResultCache, content_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ModerationPreprocessor:
+    # Joins a batch into one string; never produced by lowercasing or contraction fixing
+    SEPARATOR = '\x00'
+    # Characters that may not touch a contraction match (same as contractions.fix)
+    BOUND_CHARS = frozenset(string.ascii_letters + string.digits + '_')
+    
+    def __init__(self):
+        """
+        Text normalization pipeline for moderation, compiled once.
+        
+        Applies strip, lowercase, contraction expansion and special character
+        removal. The contraction table and the character filter are compiled
+        here instead of on every call.
+        """
+        self._contractions = self._build_contraction_table()
+        self._case_cache = {}
+        self._special_chars = re.compile(r"[^\w\s.,!?']")
+        # Same filter, but keeps the batch separator so the batch can be split afterwards
+        self._batch_special_chars = re.compile(r"[^\w\s.,!?'\x00]")
+    
+    @staticmethod
+    def _build_contraction_table() -> ahocorasick.Automaton:
+        """Compile the contractions package tables the same way contractions.fix does"""
+        automaton = ahocorasick.Automaton()
+        for table in (contractions.contractions_dict, contractions.leftovers_dict, contractions.slang_dict):
+            for key, value in table.items():
+                automaton.add_word(key.lower(), (len(key), value))
+        automaton.make_automaton()
+        return automaton
+    
+    def _cased(self, match: str, norm: str) -> str:
+        """Give the replacement the casing of the matched text, memoized per pair"""
+        cased = self._case_cache.get((match, norm))
+        if cased is None:
+            if match == match.upper():
+                cased = norm.upper()
+            elif match == match.title():
+                cased = norm.title()
+            elif match == match.lower():
+                cased = norm.lower()
+            elif match == match[0].upper() + match[1:].lower():
+                cased = norm[0].upper() + norm[1:].lower()
+            else:
+                cased = norm
+            self._case_cache[(match, norm)] = cased
+        return cased
+    
+    def _fix_contractions(self, text: str) -> str:
+        """
+        Expand contractions and slang, producing exactly what contractions.fix would.
+        
+        Matches must not touch an ASCII letter, digit or underscore on either
+        side, and overlapping matches resolve to the longer one.
+        """
+        bound_chars = self.BOUND_CHARS
+        text_length = len(text)
+        keywords = [(0, 0, 0, "")]  # (length, start, stop, replacement)
+        current_stop = -1
+        for end_index, (length, norm) in self._contractions.iter(text.lower()):
+            start = end_index - length + 1
+            stop = end_index + 1
+            if stop != text_length and text[stop] in bound_chars:
+                continue
+            if start != 0 and text[start - 1] in bound_chars:
+                continue
+            replacement = self._cased(text[start:stop], norm)
+            if start >= current_stop:
+                current_stop = stop
+                keywords.append((current_stop - start, start, current_stop, replacement))
+            elif stop - start > keywords[-1][0]:
+                current_stop = max(current_stop, stop)
+                keywords[-1] = (current_stop - start, start, current_stop, replacement)
+        
+        if len(keywords) == 1:
+            return text
+        parts = []
+        previous_stop = 0
+        for _, start, stop, replacement in keywords[1:]:
+            parts.append(text[previous_stop:start])
+            parts.append(replacement)
+            previous_stop = stop
+        parts.append(text[previous_stop:])
+        return "".join(parts)
+    
+    def _fix(self, text: str) -> str:
+        try:
+            return self._fix_contractions(text)
+        except Exception as e:
+            logger.debug(f"Contraction fixing failed, keeping text as is: {e}")
+            return text
+    
+    def __call__(self, text: str) -> str:
+        """Normalize a single text"""
+        if not isinstance(text, str):
+            raise ValueError("Input must be a string")
+            
+        text = text.strip()
+        if not text:
+            return text
+            
+        text = text.lower()
+        text = self._fix(text)
+        
+        # Remove special characters except basic punctuation
+        return self._special_chars.sub("", text)
+    
+    def process_batch(self, texts: List[str]) -> Tuple[List[str], Dict[str, float]]:
+        """
+        Normalize a list of texts in one pass per stage.
+        
+        The non-empty texts are joined with a separator so lowercasing,
+        contraction fixing and character filtering each run once over the
+        whole batch. Output is identical to calling the preprocessor per text.
+        
+        Args:
+            texts: List of strings to normalize
+            
+        Returns:
+            Tuple of (normalized texts in input order, seconds spent per stage)
+        """
+        if not all(isinstance(text, str) for text in texts):
+            raise ValueError("Input must be a list of strings")
+        
+        timings = {"strip_lowercase": 0.0, "contractions": 0.0, "special_chars": 0.0}
+        start = time.perf_counter()
+        stripped = [text.strip() for text in texts]
+        outputs = list(stripped)
+        # Texts that already contain the separator are handled one by one
+        indices = [i for i, text in enumerate(stripped) if text and self.SEPARATOR not in text]
+        for i, text in enumerate(stripped):
+            if text and self.SEPARATOR in text:
+                outputs[i] = self(text)
+        if not indices:
+            timings["strip_lowercase"] = time.perf_counter() - start
+            return outputs, timings
+        joined = self.SEPARATOR.join(stripped[i] for i in indices).lower()
+        timings["strip_lowercase"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        fixed = self._fix(joined)
+        timings["contractions"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        filtered = self._batch_special_chars.sub("", fixed)
+        parts = filtered.split(self.SEPARATOR)
+        timings["special_chars"] = time.perf_counter() - start
+        
+        if len(parts) != len(indices):
+            # Should never happen, but never return misaligned results
+            logger.warning("Batch preprocessing misaligned, falling back to per-text processing")
+            return [self(text) for text in texts], timings
+        
+        for i, part in zip(indices, parts):
+            outputs[i] = part
+        return outputs, timings
+
 class ToxicityChecker:
+    BACKENDS = ('torch', 'onnx', 'onnx-int8')
+    
     def __init__(self, model_type: str = 'original', threshold: float = 0.7, 
                  custom_weights: Optional[Dict[str, float]] = None,
-                 banned_words: Optional[List[str]] = None):
+                 banned_words: Optional[List[str]] = None,
+                 batch_size: int = 32,
+                 banned_word_boundary: bool = False,
+                 cache_size: int = 0,
+                 cache_path: Optional[str] = None,
+                 backend: str = 'torch',
+                 onnx_threads: Optional[int] = None,
+                 onnx_cache_dir: Optional[str] = None):
         """
         Initialize toxicity detection model with enhanced configuration.
         
@@ -22,11 +193,28 @@ class ToxicityChecker:
             threshold: Default toxicity threshold for flagging (0-1)
             custom_weights: Custom weights for toxicity dimensions
             banned_words: List of words that should automatically flag content
+            batch_size: Default number of texts per model forward pass in batch_check
+            banned_word_boundary: Only match banned words as whole words
+            cache_size: Number of raw model results to keep in an LRU cache (0 disables it)
+            cache_path: Optional SQLite file so cached results survive restarts
+            backend: Inference backend ('torch', 'onnx' or 'onnx-int8')
+            onnx_threads: Intra-op threads for the ONNX backends (None lets ONNX Runtime decide)
+            onnx_cache_dir: Directory for exported ONNX models
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}")
+        
+        self.model_type = model_type
+        self.backend = backend
+        self.onnx_threads = onnx_threads
+        self.onnx_cache_dir = onnx_cache_dir
         self.model = self._load_model(model_type)
+        self.preprocessor = ModerationPreprocessor()
         self.threshold = threshold
+        self.batch_size = batch_size
         self.supported_languages = ['en']  # Add more if using multilingual model
-        self.banned_words = set(word.lower() for word in banned_words) if banned_words else None
+        self.banned_word_boundary = banned_word_boundary
+        self.set_banned_words(banned_words)
         
         # Default weights for toxicity dimensions
         self.weights = {
@@ -41,49 +229,156 @@ class ToxicityChecker:
         if custom_weights:
             self.weights.update(custom_weights)
         
-    def _load_model(self, model_type: str) -> Detoxify:
+        # Cache raw per-dimension scores; weights and thresholds are applied on lookup
+        self.cache = None
+        if cache_size or cache_path:
+            self.cache = ResultCache(max_entries=cache_size or 10000, path=cache_path)
+        
+    def set_banned_words(self, banned_words: Optional[List[str]]) -> None:
+        """
+        Replace the banned word list and rebuild its matcher (safe to call for hot reloads).
+        
+        Args:
+            banned_words: New list of banned words, or None to disable the check
+        """
+        matcher = BannedWordMatcher(banned_words or [], word_boundary=self.banned_word_boundary)
+        # Swap both references together so readers never see a half-built matcher
+        self._banned_matcher = matcher
+        self.banned_words = set(matcher.words) if matcher.words else None
+    
+    def find_banned_words(self, text: str) -> List[Tuple[int, int, str]]:
+        """Return (start, end, word) spans of banned words found in text"""
+        return self._banned_matcher.find_all(text)
+    
+    def _load_model(self, model_type: str):
         """Safely load the Detoxify model with error handling"""
         try:
-            logger.info(f"Loading Detoxify model: {model_type}")
-            return Detoxify(model_type)
+            logger.info(f"Loading Detoxify model: {model_type} ({self.backend} backend)")
+            # Backends are imported lazily: ONNX deployments never load torch,
+            # and torch deployments don't need onnxruntime
+            if self.backend == 'torch':
+                from detoxify import Detoxify
+                return Detoxify(model_type)
+            
+            from onnx_backend import OnnxDetoxify
+            return OnnxDetoxify(
+                model_type,
+                quantize=self.backend == 'onnx-int8',
+                cache_dir=self.onnx_cache_dir,
+                intra_op_threads=self.onnx_threads
+            )
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise RuntimeError(f"Could not initialize toxicity detector: {e}")
     
     def preprocess_text(self, text: str) -> str:
         """Enhanced text preprocessing"""
-        if not isinstance(text, str):
-            raise ValueError("Input must be a string")
-            
-        text = text.strip()
-        if not text:
-            return text
-            
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Fix contractions
-        try:
-            text = contractions.fix(text)
-        except:
-            pass
-            
-        # Remove special characters except basic punctuation
-        text = re.sub(r"[^\w\s.,!?']", "", text)
+        with instrumentation.timer("moderation.preprocess"):
+            return self.preprocessor(text)
+    
+    def _weighted_sum(self, scores):
+        """
+        Weighted toxicity score of per-dimension floats or per-dimension arrays.
         
-        return text
+        Both score paths go through this one left-to-right sum, so a text gets
+        bit-identical scores from check_toxicity and from batch_check.
+        """
+        total = 0.0
+        for dim, weight in self.weights.items():
+            total = total + scores[dim] * weight
+        return total
     
     def _calculate_toxicity_score(self, results: Dict[str, float]) -> float:
         """Calculate weighted toxicity score"""
-        return sum(results[dim] * weight for dim, weight in self.weights.items())
+        return float(self._weighted_sum(results))
     
     def _contains_banned_words(self, text: str) -> bool:
         """Check if text contains any banned words"""
-        if not self.banned_words:
-            return False
-            
-        text_lower = text.lower()
-        return any(banned_word in text_lower for banned_word in self.banned_words)
+        return self._banned_matcher.contains(text)
+    
+    def _empty_result(self, threshold: Optional[float], error: str) -> Dict[str, Union[bool, float, dict, str]]:
+        """Result returned for empty input or when analysis fails"""
+        return {
+            "flagged": False,
+            "toxicity_score": 0.0,
+            "detailed_scores": {},
+            "threshold": threshold or self.threshold,
+            "text_length": 0,
+            "triggered_banned_words": [],
+            "error": error
+        }
+    
+    def _build_result(self, clean_text: str, scores: Dict[str, float], toxic_score: float,
+                      threshold: Optional[float]) -> Dict[str, Union[bool, float, dict, str]]:
+        """Apply banned words and threshold to raw model scores"""
+        # Check for banned words in a single pass over the text
+        with instrumentation.timer("moderation.banned_words"):
+            triggered_banned_words = self._banned_matcher.matched_words(clean_text)
+        
+        # Use provided threshold or default
+        current_threshold = threshold if threshold is not None else self.threshold
+        
+        # Determine if content should be flagged
+        flagged = (toxic_score > current_threshold) or bool(triggered_banned_words)
+        
+        # If banned words triggered, boost the toxicity score
+        if triggered_banned_words:
+            toxic_score = max(toxic_score, 0.8)  # Minimum score when banned words found
+        
+        return {
+            "flagged": bool(flagged),
+            "toxicity_score": float(toxic_score),
+            "detailed_scores": {k: float(v) for k, v in scores.items()},
+            "threshold": current_threshold,
+            "text_length": len(clean_text),
+            "triggered_banned_words": triggered_banned_words,
+            "error": None
+        }
+    
+    def _build_item_result(self, clean_text: str, scores: Dict[str, float], toxic_score: float,
+                           threshold: Optional[float]) -> Dict[str, Union[bool, float, dict, str]]:
+        """_build_result for one batch item, turning failures into that item's error result"""
+        try:
+            return self._build_result(clean_text, scores, toxic_score, threshold)
+        except Exception as e:
+            logger.error(f"Error analyzing toxicity: {e}", exc_info=True)
+            instrumentation.increment("moderation.error")
+            return self._empty_result(threshold, str(e))
+    
+    def _cache_key(self, clean_text: str) -> str:
+        return content_key(self.model_type, self.backend, clean_text)
+    
+    def cache_stats(self) -> Optional[Dict[str, Union[int, float]]]:
+        """Hit/miss counters of the result cache, or None when caching is disabled"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def _predict_scores(self, clean_text: str) -> Dict[str, float]:
+        """Raw per-dimension scores for one preprocessed text, served from cache when possible"""
+        if self.cache is not None:
+            cached = self.cache.get(self._cache_key(clean_text))
+            if cached is not None:
+                instrumentation.increment("moderation.cache_hit")
+                return cached
+            instrumentation.increment("moderation.cache_miss")
+        
+        with instrumentation.timer("moderation.predict"):
+            scores = {k: float(v) for k, v in self.model.predict(clean_text).items()}
+        if self.cache is not None:
+            self.cache.put(self._cache_key(clean_text), scores)
+        return scores
+    
+    def _predict_batch(self, texts: List[str]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Run a single model forward pass over a mini-batch of preprocessed texts.
+        
+        Returns:
+            Tuple of (per-dimension score arrays, weighted toxicity score array)
+        """
+        with instrumentation.timer("moderation.predict_batch"):
+            raw = self.model.predict(texts)
+        scores = {dim: np.asarray(values, dtype=np.float64).reshape(-1) for dim, values in raw.items()}
+        # Vectorized over the batch, in the same summation order as _calculate_toxicity_score
+        return scores, self._weighted_sum(scores)
     
     def check_toxicity(self, text: str, threshold: float = None) -> Dict[str, Union[bool, float, dict, str]]:
         """
@@ -107,77 +402,128 @@ class ToxicityChecker:
             # Validate and preprocess input
             clean_text = self.preprocess_text(text)
             if not clean_text:
-                return {
-                    "flagged": False,
-                    "toxicity_score": 0.0,
-                    "detailed_scores": {},
-                    "threshold": threshold or self.threshold,
-                    "text_length": 0,
-                    "triggered_banned_words": [],
-                    "error": "Empty text input"
-                }
-            
-            # Check for banned words first
-            triggered_banned_words = []
-            if self.banned_words:
-                triggered_banned_words = [
-                    word for word in self.banned_words 
-                    if word in clean_text.lower()
-                ]
+                return self._empty_result(threshold, "Empty text input")
             
             # Get toxicity predictions
-            results = self.model.predict(clean_text)
-            
-            # Use provided threshold or default
-            current_threshold = threshold if threshold is not None else self.threshold
+            results = self._predict_scores(clean_text)
             
             # Calculate weighted toxicity score
             toxic_score = self._calculate_toxicity_score(results)
             
-            # Determine if content should be flagged
-            flagged = (toxic_score > current_threshold) or bool(triggered_banned_words)
-            
-            # If banned words triggered, boost the toxicity score
-            if triggered_banned_words:
-                toxic_score = max(toxic_score, 0.8)  # Minimum score when banned words found
-            
-            return {
-                "flagged": flagged,
-                "toxicity_score": float(toxic_score),
-                "detailed_scores": {k: float(v) for k, v in results.items()},
-                "threshold": current_threshold,
-                "text_length": len(clean_text),
-                "triggered_banned_words": triggered_banned_words,
-                "error": None
-            }
+            return self._build_result(clean_text, results, toxic_score, threshold)
             
         except Exception as e:
             logger.error(f"Error analyzing toxicity: {e}", exc_info=True)
-            return {
-                "flagged": False,
-                "toxicity_score": 0.0,
-                "detailed_scores": {},
-                "threshold": threshold or self.threshold,
-                "text_length": 0,
-                "triggered_banned_words": [],
-                "error": str(e)
-            }
-    
-    def batch_check(self, texts: List[str], threshold: float = None) -> List[Dict[str, Union[bool, float, dict, str]]]:
+            instrumentation.increment("moderation.error")
+            return self._empty_result(threshold, str(e))
+    
+    def batch_check(self, texts: List[str], threshold: float = None,
+                    batch_size: Optional[int] = None) -> List[Dict[str, Union[bool, float, dict, str]]]:
         """
         Analyze multiple texts for toxicity more efficiently.
         
+        Texts are preprocessed up front, sorted by length and grouped into
+        mini-batches so that each batch needs a single model forward pass
+        with minimal padding. Results are returned in input order.
+        
         Args:
             texts: List of text strings to analyze
             threshold: Custom threshold for flagging
+            batch_size: Texts per forward pass (defaults to self.batch_size)
             
         Returns:
             List of result dictionaries for each text
         """
         if not isinstance(texts, list):
             raise ValueError("Input must be a list of strings")
+        
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(texts)
+        
+        # Preprocess everything first, isolating per-item failures.
+        # Identical texts are grouped so each one is predicted only once.
+        valid = []
+        for index, text in enumerate(texts):
+            if isinstance(text, str):
+                valid.append(index)
+            else:
+                logger.error("Error analyzing toxicity: Input must be a string")
+                results[index] = self._empty_result(threshold, "Input must be a string")
+        
+        with instrumentation.timer("moderation.preprocess_batch"):
+            clean_texts, timings = self.preprocessor.process_batch([texts[index] for index in valid])
+        logger.debug(f"Preprocessed {len(valid)} texts, stage timings: {timings}")
+        
+        pending = defaultdict(list)
+        for index, clean_text in zip(valid, clean_texts):
+            if not clean_text:
+                results[index] = self._empty_result(threshold, "Empty text input")
+                continue
+            pending[clean_text].append(index)
+        
+        # Serve repeated texts from the cache instead of the model
+        if self.cache is not None:
+            for clean_text in list(pending):
+                cached = self.cache.get(self._cache_key(clean_text))
+                if cached is None:
+                    instrumentation.increment("moderation.cache_miss")
+                else:
+                    instrumentation.increment("moderation.cache_hit")
+                    toxic_score = self._calculate_toxicity_score(cached)
+                    for index in pending.pop(clean_text):
+                        results[index] = self._build_item_result(clean_text, cached, toxic_score, threshold)
+        
+        # Length-bucketed mini-batches keep padding per forward pass small
+        unique_texts = sorted(pending, key=len)
+        for start in range(0, len(unique_texts), batch_size):
+            batch = unique_texts[start:start + batch_size]
+            try:
+                scores, toxic_scores = self._predict_batch(batch)
+            except Exception as e:
+                # Retry item by item so one bad input can't fail the whole batch
+                logger.warning(f"Batched prediction failed, falling back to single checks: {e}")
+                instrumentation.increment("moderation.batch_fallback")
+                for clean_text in batch:
+                    for index in pending[clean_text]:
+                        results[index] = self.check_toxicity(texts[index], threshold)
+                continue
             
-        return [self.check_toxicity(text, threshold) for text in texts]
+            for row, clean_text in enumerate(batch):
+                item_scores = {dim: float(values[row]) for dim, values in scores.items()}
+                if self.cache is not None:
+                    self.cache.put(self._cache_key(clean_text), item_scores)
+                for index in pending[clean_text]:
+                    results[index] = self._build_item_result(clean_text, item_scores, toxic_scores[row], threshold)
+        
+        return results
+    
+    def check_stream(self, texts: Iterable[str], threshold: float = None,
+                     batch_size: Optional[int] = None,
+                     chunk_size: Optional[int] = None) -> Iterator[Dict[str, Union[bool, float, dict, str]]]:
+        """
+        Analyze an arbitrarily long stream of texts with bounded memory.
+        
+        Texts are pulled lazily in chunks, each chunk goes through batch_check
+        (so it still gets deduplication, caching and length-sorted batches),
+        and results are yielded one by one in input order.
+        
+        Args:
+            texts: Any iterable of text strings, e.g. a generator over a file
+            threshold: Custom threshold for flagging
+            batch_size: Texts per forward pass (defaults to self.batch_size)
+            chunk_size: Texts read ahead per batch_check call (defaults to 8 batches)
+            
+        Yields:
+            Result dictionary for each text, as returned by check_toxicity
+        """
+        batch_size = batch_size or self.batch_size
+        chunk_size = chunk_size or batch_size * 8
+        iterator = iter(texts)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield from self.batch_check(chunk, threshold, batch_size)
 
 
 # Example usage
@@ -0,0 +1,222 @@
+import json
+import logging
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import Ridge
+
+import instrumentation
+from moderation_bot import ToxicityChecker
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ModerationCascade:
+    def __init__(self, checker: ToxicityChecker, target_recall: float = 0.99, n_features: int = 2 ** 18,
+                 alpha: float = 1.0):
+        """
+        Two-stage moderation: a cheap pre-filter in front of the full Detoxify model.
+
+        The first stage preprocesses each text like ToxicityChecker does, flags
+        banned words directly, and scores the rest with a linear model over
+        hashed word and character n-grams. That model is trained (fit) to
+        predict the checker's own weighted toxicity score. Texts scoring below
+        a cutoff are returned as clean without running Detoxify; everything
+        else is escalated to the full checker, so every flagged result still
+        carries the model's detailed scores.
+
+        The cutoff is calibrated on held-out texts so that at least
+        target_recall of the texts the full model flags are escalated.
+
+        Args:
+            checker: ToxicityChecker used for escalations and to label training texts
+            target_recall: Fraction of full-model flags the cascade must keep (0-1)
+            n_features: Hash space per n-gram vectorizer
+            alpha: L2 regularization of the linear model
+        """
+        self.checker = checker
+        self.target_recall = target_recall
+        self.n_features = n_features
+        self.alpha = alpha
+        self._word_vectorizer = HashingVectorizer(ngram_range=(1, 2), n_features=n_features,
+                                                  alternate_sign=False)
+        self._char_vectorizer = HashingVectorizer(analyzer='char_wb', ngram_range=(2, 4),
+                                                  n_features=n_features, alternate_sign=False)
+        self._coef = None
+        self._intercept = 0.0
+        # Held-out (predicted, true) weighted scores used to place the cutoff
+        self._calibration_predicted = None
+        self._calibration_scores = None
+        self._cutoffs = {}
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._coef is not None
+
+    def _features(self, clean_texts: List[str]) -> sparse.csr_matrix:
+        return sparse.hstack([self._word_vectorizer.transform(clean_texts),
+                              self._char_vectorizer.transform(clean_texts)], format='csr')
+
+    def _predict(self, clean_texts: List[str]) -> np.ndarray:
+        return self._features(clean_texts) @ self._coef + self._intercept
+
+    def fit(self, texts: List[str], holdout: float = 0.25, seed: int = 0) -> Dict[str, Union[int, float]]:
+        """
+        Train the pre-filter on the full checker's scores for a sample of real traffic.
+
+        Args:
+            texts: Unlabeled texts; the checker labels them
+            holdout: Fraction kept aside to calibrate the cutoff
+            seed: Seed for the train/holdout split
+
+        Returns:
+            Dictionary with training and calibration set sizes and the holdout fit error
+        """
+        results = self.checker.batch_check(texts)
+        clean_texts, _ = self.checker.preprocessor.process_batch(
+            [text if isinstance(text, str) else "" for text in texts])
+
+        # Banned-word hits never reach the linear model, and their scores are boosted; leave them out
+        samples = [(clean_text, result["toxicity_score"]) for clean_text, result in zip(clean_texts, results)
+                   if result["error"] is None and not result["triggered_banned_words"]]
+        if len(samples) < 2:
+            raise ValueError("Need at least two analyzable texts to fit the cascade")
+
+        order = np.random.default_rng(seed).permutation(len(samples))
+        split = max(1, min(len(samples) - 1, int(round(len(samples) * holdout))))
+        calibration, training = order[:split], order[split:]
+
+        features = self._features([clean_text for clean_text, _ in samples])
+        scores = np.array([score for _, score in samples], dtype=np.float64)
+        model = Ridge(alpha=self.alpha)
+        model.fit(features[training], scores[training])
+        self._coef = model.coef_.astype(np.float64)
+        self._intercept = float(model.intercept_)
+
+        self._calibration_predicted = features[calibration] @ self._coef + self._intercept
+        self._calibration_scores = scores[calibration]
+        self._cutoffs = {}
+        error = float(np.sqrt(np.mean((self._calibration_predicted - self._calibration_scores) ** 2)))
+        logger.info(f"Fitted moderation cascade on {len(training)} texts "
+                    f"({len(calibration)} held out, RMSE {error:.4f})")
+        return {"training": len(training), "calibration": len(calibration), "rmse": error}
+
+    def cutoff(self, threshold: Optional[float] = None) -> float:
+        """
+        Pre-filter score below which texts are not escalated, for a flagging threshold.
+
+        The cutoff is the (1 - target_recall) quantile of the predicted scores
+        of held-out texts the full model flags at this threshold. With no such
+        texts to calibrate on, everything is escalated.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ModerationCascade must be fitted before use")
+        threshold = threshold if threshold is not None else self.checker.threshold
+        key = (threshold, self.target_recall)
+        if key not in self._cutoffs:
+            positives = self._calibration_predicted[self._calibration_scores > threshold]
+            if len(positives) == 0:
+                logger.warning(f"No held-out texts are flagged at threshold {threshold}; escalating everything")
+                self._cutoffs[key] = -np.inf
+            else:
+                self._cutoffs[key] = float(np.quantile(positives, 1 - self.target_recall, method='lower'))
+        return self._cutoffs[key]
+
+    def batch_check(self, texts: List[str], threshold: float = None,
+                    batch_size: Optional[int] = None) -> List[Dict[str, Union[bool, float, dict, str]]]:
+        """
+        Same contract as ToxicityChecker.batch_check, running Detoxify only on escalated texts.
+
+        Each result has an extra "stage" key: "banned_words" or "prefilter" when
+        the first stage decided, "model" when the text was escalated.
+        Pre-filtered results have empty detailed_scores and the pre-filter's
+        estimate as toxicity_score, which is always below the threshold.
+        """
+        if not isinstance(texts, list):
+            raise ValueError("Input must be a list of strings")
+
+        cutoff = self.cutoff(threshold)
+        current_threshold = threshold if threshold is not None else self.checker.threshold
+        results = [None] * len(texts)
+        candidates = []
+        with instrumentation.timer("cascade.prefilter"):
+            valid = [index for index, text in enumerate(texts) if isinstance(text, str)]
+            clean_texts, _ = self.checker.preprocessor.process_batch([texts[index] for index in valid])
+            for index, clean_text in zip(valid, clean_texts):
+                if not clean_text:
+                    continue  # Left to the checker, which reports the empty input
+                banned = list(dict.fromkeys(word for _, _, word in self.checker.find_banned_words(clean_text)))
+                if banned:
+                    results[index] = self._first_stage_result(clean_text, 0.8, True, current_threshold,
+                                                              banned, "banned_words")
+                else:
+                    candidates.append((index, clean_text))
+
+            if candidates:
+                predicted = self._predict([clean_text for _, clean_text in candidates])
+                # A cutoff calibrated above the threshold must not return a clean result scored over it
+                limit = min(cutoff, current_threshold)
+                for (index, clean_text), score in zip(candidates, predicted):
+                    if score < limit:
+                        results[index] = self._first_stage_result(clean_text, min(max(score, 0.0), 1.0), False,
+                                                                  current_threshold, [], "prefilter")
+
+        escalated = [index for index, result in enumerate(results) if result is None]
+        instrumentation.increment("cascade.escalated", len(escalated))
+        instrumentation.increment("cascade.prefiltered", len(texts) - len(escalated))
+        if escalated:
+            model_results = self.checker.batch_check([texts[index] for index in escalated], threshold, batch_size)
+            for index, result in zip(escalated, model_results):
+                results[index] = {**result, "stage": "model"}
+        return results
+
+    def check_toxicity(self, text: str, threshold: float = None) -> Dict[str, Union[bool, float, dict, str]]:
+        """Single-text convenience wrapper"""
+        return self.batch_check([text], threshold)[0]
+
+    @staticmethod
+    def _first_stage_result(clean_text: str, score: float, flagged: bool, threshold: float,
+                            banned: List[str], stage: str) -> Dict[str, Union[bool, float, dict, str]]:
+        return {
+            "flagged": flagged,
+            "toxicity_score": float(score),
+            "detailed_scores": {},
+            "threshold": threshold,
+            "text_length": len(clean_text),
+            "triggered_banned_words": banned,
+            "error": None,
+            "stage": stage
+        }
+
+    def save(self, path: str) -> None:
+        """Write the trained pre-filter and its calibration data to path (.npz)"""
+        if not self.is_fitted:
+            raise RuntimeError("ModerationCascade must be fitted before saving")
+        meta = {"n_features": self.n_features, "alpha": self.alpha, "intercept": self._intercept,
+                "target_recall": self.target_recall}
+        np.savez_compressed(path, coef=self._coef, calibration_predicted=self._calibration_predicted,
+                            calibration_scores=self._calibration_scores, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path: str, checker: ToxicityChecker, target_recall: Optional[float] = None) -> 'ModerationCascade':
+        """
+        Load a pre-filter written by save().
+
+        Args:
+            path: File written by save()
+            checker: ToxicityChecker for escalations (should use the same model and weights as in training)
+            target_recall: Overrides the saved recall target
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            cascade = cls(checker, target_recall if target_recall is not None else meta["target_recall"],
+                          meta["n_features"], meta["alpha"])
+            cascade._coef = data["coef"]
+            cascade._intercept = meta["intercept"]
+            cascade._calibration_predicted = data["calibration_predicted"]
+            cascade._calibration_scores = data["calibration_scores"]
+        return cascade
@@ -0,0 +1,147 @@
+import gc
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import sys
+from typing import Dict, List, Optional, Union
+
+from moderation_bot import ToxicityChecker
+from result_cache import ResultCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Checkers created in the parent, looked up by forked workers (never pickled)
+_parent_checkers = {}
+_pool_ids = itertools.count()
+_worker_checker = None
+
+
+def _pin_threads(threads: int) -> None:
+    """Limit a worker's math libraries to a fixed number of threads"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    # Only touch torch if the worker's backend loaded it; importing it would cost hundreds of MB
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already fixed once any parallel work has run
+
+
+def _init_worker(pool_id: int, threads: int, checker_kwargs: Dict) -> None:
+    global _worker_checker
+    _pin_threads(threads)
+    _worker_checker = _parent_checkers.get(pool_id)
+    if _worker_checker is None:
+        # Spawned worker or ONNX backend: load a private copy
+        _worker_checker = ToxicityChecker(**checker_kwargs)
+        _pin_threads(threads)
+    elif checker_kwargs.get("cache_path"):
+        # A SQLite connection must not cross fork(); each worker opens its own
+        _worker_checker.cache = ResultCache(max_entries=checker_kwargs.get("cache_size") or 10000,
+                                            path=checker_kwargs["cache_path"])
+
+
+def _check_chunk(args):
+    texts, threshold, batch_size = args
+    return _worker_checker.batch_check(texts, threshold, batch_size)
+
+
+class ModerationPool:
+    def __init__(self, workers: Optional[int] = None, threads_per_worker: int = 1,
+                 batch_size: int = 32, **checker_kwargs):
+        """
+        ToxicityChecker spread over several worker processes.
+
+        With the torch backend on platforms that support fork, the model is
+        loaded once in the parent and the workers are forked from it, so they
+        share the weights copy-on-write instead of each holding a copy. ONNX
+        Runtime sessions don't survive a fork, so with the ONNX backends (or
+        under spawn) every worker loads its own model.
+
+        Args:
+            workers: Number of worker processes (defaults to the CPU count)
+            threads_per_worker: Intra-op threads each worker may use
+            batch_size: Texts per forward pass, and per task sent to a worker
+            checker_kwargs: Passed to ToxicityChecker (model_type, threshold, banned_words, ...)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        checker_kwargs["batch_size"] = batch_size
+        if checker_kwargs.get("backend", "torch") != "torch":
+            checker_kwargs.setdefault("onnx_threads", threads_per_worker)
+
+        self._pool_id = next(_pool_ids)
+        use_fork = "fork" in mp.get_all_start_methods()
+        backend = checker_kwargs.get("backend", "torch")
+        frozen = False
+        if use_fork and backend == "torch":
+            # The parent's copy opens no SQLite file; workers open their own after the fork
+            parent_kwargs = {key: value for key, value in checker_kwargs.items() if key != "cache_path"}
+            _parent_checkers[self._pool_id] = ToxicityChecker(**parent_kwargs)
+            # Keep the loaded objects out of the collector's way so workers don't copy their pages
+            gc.collect()
+            gc.freeze()
+            frozen = True
+        elif backend != "torch":
+            # Export once here rather than in every worker at the same time
+            from onnx_backend import export_model
+            export_model(checker_kwargs.get("model_type", "original"), quantize=backend == "onnx-int8",
+                         cache_dir=checker_kwargs.get("onnx_cache_dir"))
+
+        context = mp.get_context("fork" if use_fork else "spawn")
+        try:
+            self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                      initargs=(self._pool_id, threads_per_worker, checker_kwargs))
+        finally:
+            if frozen:
+                # The workers exist now; the parent (e.g. a long-running service) needs normal collection back
+                gc.unfreeze()
+        logger.info(f"Started moderation pool with {self.workers} workers x {threads_per_worker} threads "
+                    f"({context.get_start_method()})")
+
+    def batch_check(self, texts: List[str], threshold: float = None,
+                    batch_size: Optional[int] = None) -> List[Dict[str, Union[bool, float, dict, str]]]:
+        """
+        Same contract as ToxicityChecker.batch_check, with batches spread over the workers.
+
+        Texts are sorted by length and cut into batches so each forward pass
+        pads little; batches run on whichever worker is free and results are
+        returned in input order.
+        """
+        if not isinstance(texts, list):
+            raise ValueError("Input must be a list of strings")
+
+        batch_size = batch_size or self.batch_size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]) if isinstance(texts[i], str) else 0)
+        chunks = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+        tasks = [([texts[i] for i in chunk], threshold, batch_size) for chunk in chunks]
+
+        results = [None] * len(texts)
+        for chunk, chunk_results in zip(chunks, self._pool.imap(_check_chunk, tasks)):
+            for index, result in zip(chunk, chunk_results):
+                results[index] = result
+        return results
+
+    def check_toxicity(self, text: str, threshold: float = None) -> Dict[str, Union[bool, float, dict, str]]:
+        """Single-text convenience wrapper"""
+        return self.batch_check([text], threshold)[0]
+
+    def close(self) -> None:
+        """Stop the workers and release the parent's model"""
+        self._pool.close()
+        self._pool.join()
+        _parent_checkers.pop(self._pool_id, None)
+
+    def __enter__(self) -> 'ModerationPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
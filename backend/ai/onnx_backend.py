@@ -0,0 +1,166 @@
+import inspect
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'VERITA_ONNX_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'verita', 'onnx')
+)
+
+
+def _tmp_path(path: str) -> str:
+    # Per-process name: concurrent exporters (e.g. pool workers) never write the same file
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def _export(model_type: str, model_dir: str, path: str) -> None:
+    """Export the Detoxify checkpoint, tokenizer and class names to the cache"""
+    import torch
+    from detoxify import Detoxify
+    from transformers.convert_slow_tokenizer import convert_slow_tokenizer
+
+    logger.info(f"Exporting Detoxify model '{model_type}' to ONNX")
+    os.makedirs(model_dir, exist_ok=True)
+    detox = Detoxify(model_type, device='cpu')
+    model = detox.model.eval()
+    model.config.return_dict = False
+
+    sample = detox.tokenizer(["export sample text"], return_tensors="pt", truncation=True, padding=True)
+    export_kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the dynamo exporter, which needs onnxscript
+        export_kwargs['dynamo'] = False
+    tmp_path = _tmp_path(path)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"}
+            },
+            opset_version=14,
+            **export_kwargs
+        )
+
+    # Save a standalone fast tokenizer so loading needs only the tokenizers package
+    tokenizer = detox.tokenizer
+    tokenizer_path = os.path.join(model_dir, 'tokenizer.json')
+    fast_tokenizer = tokenizer.backend_tokenizer if getattr(tokenizer, 'is_fast', False) \
+        else convert_slow_tokenizer(tokenizer)
+    fast_tokenizer.save(_tmp_path(tokenizer_path))
+    os.replace(_tmp_path(tokenizer_path), tokenizer_path)
+    config_path = os.path.join(model_dir, 'detoxify.json')
+    with open(_tmp_path(config_path), 'w') as f:
+        json.dump({
+            "class_names": list(detox.class_names),
+            "max_length": min(tokenizer.model_max_length, model.config.max_position_embeddings),
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id
+        }, f)
+    os.replace(_tmp_path(config_path), config_path)
+    # Publish the model last so a half-finished export is never picked up
+    os.replace(tmp_path, path)
+
+
+def _quantize(source: str, target: str) -> None:
+    """Write a dynamically int8-quantized copy of the exported model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info(f"Quantizing {source} to int8")
+    tmp_path = _tmp_path(target)
+    quantize_dynamic(source, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, target)
+
+
+def export_model(model_type: str = 'original', quantize: bool = False,
+                 cache_dir: Optional[str] = None) -> str:
+    """
+    Make sure the exported (and, if asked, quantized) model is in the cache.
+
+    Safe to call from several processes at once: each writes its own
+    temporary files and publishes them with an atomic rename.
+
+    Returns:
+        Path of the ONNX model to load
+    """
+    model_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, model_type)
+    fp32_path = os.path.join(model_dir, 'model.onnx')
+    if not os.path.exists(fp32_path):
+        _export(model_type, model_dir, fp32_path)
+    if not quantize:
+        return fp32_path
+
+    model_path = os.path.join(model_dir, 'model.int8.onnx')
+    if not os.path.exists(model_path):
+        _quantize(fp32_path, model_path)
+    return model_path
+
+
+class OnnxDetoxify:
+    def __init__(self, model_type: str = 'original', quantize: bool = False,
+                 cache_dir: Optional[str] = None, intra_op_threads: Optional[int] = None):
+        """
+        Detoxify checkpoint served through ONNX Runtime on CPU.
+
+        The first run exports the PyTorch checkpoint (and its tokenizer) into
+        cache_dir; later runs load the exported files without importing torch
+        or transformers.
+
+        Args:
+            model_type: Type of Detoxify model ('original', 'unbiased', 'multilingual')
+            quantize: Use a dynamically int8-quantized copy of the model
+            cache_dir: Directory holding exported models (defaults to VERITA_ONNX_CACHE)
+            intra_op_threads: Threads used inside each ONNX operator (None lets ORT decide)
+        """
+        self.model_type = model_type
+        self.quantize = quantize
+        self.model_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, model_type)
+        model_path = export_model(model_type, quantize, cache_dir)
+
+        with open(os.path.join(self.model_dir, 'detoxify.json')) as f:
+            config = json.load(f)
+        self.class_names = config['class_names']
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=config['max_length'])
+        self.tokenizer.enable_padding(pad_id=config['pad_token_id'], pad_token=config['pad_token'])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        logger.info(f"Loaded ONNX Detoxify model from {model_path}")
+
+    def predict(self, text: Union[str, List[str]]) -> Dict[str, Union[float, List[float]]]:
+        """
+        Score text the same way Detoxify.predict does.
+
+        Returns:
+            Dict of dimension -> score for a string, or dimension -> list of scores for a list
+        """
+        encodings = self.tokenizer.encode_batch([text] if isinstance(text, str) else list(text))
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        }
+        logits = self.session.run(None, feed)[0]
+        scores = 1 / (1 + np.exp(-logits))
+
+        if isinstance(text, str):
+            return {name: float(scores[0][i]) for i, name in enumerate(self.class_names)}
+        return {name: scores[:, i].tolist() for i, name in enumerate(self.class_names)}
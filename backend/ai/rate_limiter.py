@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Thread-safe token bucket refilled continuously at a per-minute rate.
+
+        Args:
+            rate_per_minute: Units added to the bucket every minute
+            capacity: Maximum burst size (defaults to one minute worth of units)
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or float(rate_per_minute)
+        self._available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount units from the bucket, going into debt if needed.
+
+        Returns:
+            Seconds the caller must wait before the reservation is honoured
+        """
+        # Never ask for more than fits in the bucket, or the wait would be unbounded
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._available -= amount
+            if self._available >= 0:
+                return 0.0
+            return -self._available / self.rate
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        """
+        Combined request and token rate limit for a remote model API.
+
+        Args:
+            requests_per_minute: Maximum requests per minute (None for no limit)
+            tokens_per_minute: Maximum input + output tokens per minute (None for no limit)
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens: float = 0) -> float:
+        """
+        Block until one request using the given number of tokens may be sent.
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts: str) -> str:
+    """Build a stable cache key from the SHA-256 of the given parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class _Flight:
+    """A computation in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Bounded LRU cache for JSON-serializable model outputs.
+
+        Entries live in an in-memory LRU. When a path is given, every entry is
+        also written to a SQLite file and memory misses read through to it, so
+        the cache survives restarts.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            path: Optional SQLite file backing the cache
+            disk_max_entries: Maximum number of rows kept on disk (defaults to 10x max_entries)
+            ttl: Seconds after which an entry expires (None keeps entries until evicted)
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries or max_entries * 10
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, created, cost)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes_since_prune = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.time_saved = 0.0
+
+        if path:
+            self._db = self._open_db(path)
+
+    def _open_db(self, path: str) -> sqlite3.Connection:
+        """Open (or create) the on-disk store"""
+        try:
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, "
+                "cost REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in db.execute("PRAGMA table_info(cache)")}
+            if "cost" not in columns:
+                # Files written before compute costs were tracked
+                db.execute("ALTER TABLE cache ADD COLUMN cost REAL NOT NULL DEFAULT 0")
+            db.commit()
+            logger.info(f"Opened result cache at {path}")
+            return db
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open result cache: {e}")
+            raise RuntimeError(f"Could not open result cache at {path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def _remember(self, key: str, value: Any, created: float, cost: float) -> None:
+        """Insert into the memory LRU, evicting the least recently used entry"""
+        self._entries[key] = (value, created, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Find a live entry in memory or on disk; caller must hold the lock"""
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT value, created, cost FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), row[1], row[2])
+                self._remember(key, *entry)
+        if entry is None:
+            return None
+
+        value, created, cost = entry
+        if self._expired(created):
+            self._entries.pop(key, None)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value, cost
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look up a value, returning None on a miss"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.time_saved += entry[1]
+            return entry[0]
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return the cached value for key, computing and storing it on a miss.
+
+        Concurrent callers asking for the same missing key share a single
+        compute() call instead of each running their own.
+
+        Returns:
+            Tuple of (value, True if the value came from the cache or another caller)
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                self.time_saved += entry[1]
+                return entry[0], True
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            start = time.perf_counter()
+            flight.value = compute()
+            self.put(key, flight.value, cost=time.perf_counter() - start)
+            return flight.value, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def put(self, key: str, value: Any, cost: float = 0.0) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            cost: Seconds it took to compute the value, reported as time saved on hits
+        """
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created, cost)
+            if self._db is None:
+                return
+
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created, cost) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), created, cost)
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 1000:
+                    self._prune_disk()
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist cache entry: {e}")
+
+    def _prune_disk(self) -> None:
+        """Drop expired rows and the oldest rows once the disk store grows past its bound"""
+        self._writes_since_prune = 0
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        )
+
+    def clear(self) -> None:
+        """Remove all entries from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "time_saved": round(self.time_saved, 3),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+    def close(self) -> None:
+        """Close the on-disk store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,158 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Iterator, Optional, Tuple
+
+from moderation_bot import ToxicityChecker
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def read_jsonl(path: str, start_byte: int = 0) -> Iterator[Tuple[Optional[Dict], int]]:
+    """
+    Yield (record, byte offset just past it) for each line of a JSONL file.
+
+    Malformed lines yield (None, offset) so they still get a result row.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start_byte)
+        position = start_byte
+        for line in f:
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Malformed JSON ending at byte {position}")
+                record = None
+            yield (record if isinstance(record, dict) else None), position
+
+
+def read_csv(path: str, skip_records: int = 0) -> Iterator[Tuple[Optional[Dict], None]]:
+    """Yield (row, None) for each CSV row after the first skip_records"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            if index >= skip_records:
+                yield row, None
+
+
+def load_checkpoint(path: Optional[str]) -> Dict:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"records": 0, "input_bytes": 0, "output_bytes": 0}
+
+
+def save_checkpoint(path: str, checkpoint: Dict) -> None:
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def moderate_file(checker: ToxicityChecker, input_path: str, output_path: str, input_format: str = 'jsonl',
+                  text_field: str = 'content', id_field: str = '_id', checkpoint_path: Optional[str] = None,
+                  checkpoint_every: int = 1000, progress_interval: float = 10.0,
+                  threshold: Optional[float] = None, batch_size: Optional[int] = None) -> int:
+    """
+    Moderate every record of a JSONL or CSV export, appending one JSON result per line.
+
+    With a checkpoint file the job can be stopped and rerun: output written
+    after the last checkpoint is truncated and reading resumes from the
+    checkpointed offset, so no record is lost or written twice.
+
+    Returns:
+        Number of records processed by this run
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint["records"]:
+        logger.info(f"Resuming after {checkpoint['records']} records")
+
+    if input_format == 'jsonl':
+        records = read_jsonl(input_path, checkpoint["input_bytes"])
+    else:
+        records = read_csv(input_path, checkpoint["records"])
+
+    # Records whose texts check_stream has pulled but not yet returned results for
+    pending = deque()
+
+    def texts():
+        for record, position in records:
+            pending.append((record, position))
+            yield record.get(text_field) if record is not None else None
+
+    mode = 'r+b' if os.path.exists(output_path) and checkpoint_path else 'wb'
+    processed = 0
+    offset = checkpoint["records"]
+    input_bytes = checkpoint["input_bytes"]
+    start = last_report = time.perf_counter()
+    with open(output_path, mode) as out:
+        out.seek(checkpoint["output_bytes"])
+        out.truncate()
+
+        for result in checker.check_stream(texts(), threshold, batch_size):
+            record, position = pending.popleft()
+            if position is not None:
+                input_bytes = position
+            row = {"offset": offset, "id": record.get(id_field) if record is not None else None, **result}
+            out.write((json.dumps(row) + "\n").encode('utf-8'))
+            offset += 1
+            processed += 1
+
+            if checkpoint_path and processed % checkpoint_every == 0:
+                out.flush()
+                os.fsync(out.fileno())
+                save_checkpoint(checkpoint_path, {"records": offset, "input_bytes": input_bytes,
+                                                  "output_bytes": out.tell()})
+
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                logger.info(f"{offset} records done, {processed / (now - start):.1f} records/s")
+                last_report = now
+
+        out.flush()
+        if checkpoint_path:
+            os.fsync(out.fileno())
+            save_checkpoint(checkpoint_path, {"records": offset, "input_bytes": input_bytes,
+                                              "output_bytes": out.tell()})
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Finished: {processed} records in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f} records/s)")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderate a JSONL or CSV export with bounded memory")
+    parser.add_argument("input", help="JSONL or CSV file, one answer/comment per record")
+    parser.add_argument("output", help="JSONL file receiving one result per record")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="Input format (defaults to the file extension)")
+    parser.add_argument("--text-field", default="content")
+    parser.add_argument("--id-field", default="_id")
+    parser.add_argument("--checkpoint", help="Checkpoint file for stop/resume")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Records between checkpoints")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress logs")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--model-type", default="original")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--cache-size", type=int, default=10000, help="Result cache entries (0 disables)")
+    args = parser.parse_args()
+
+    input_format = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    checker = ToxicityChecker(model_type=args.model_type, backend=args.backend,
+                              batch_size=args.batch_size, cache_size=args.cache_size)
+    moderate_file(checker, args.input, args.output, input_format, args.text_field, args.id_field,
+                  args.checkpoint, args.checkpoint_every, args.progress_interval, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TOPICS = ["React", "JWT", "Node.js", "MongoDB", "Python", "Django", "Docker", "Kubernetes",
+          "PostgreSQL", "Redis", "GraphQL", "TypeScript", "CSS grid", "OAuth", "WebSockets",
+          "Express", "Flask", "AWS Lambda", "Nginx", "Webpack"]
+VERBS = ["configure", "deploy", "cache", "secure", "test", "migrate", "debug", "scale",
+         "authenticate", "optimize", "structure", "connect", "validate", "paginate"]
+PROBLEMS = ["the requests are timing out", "users get logged out randomly",
+            "the build fails with a cryptic error", "queries are getting slower every day",
+            "memory usage keeps growing", "the tokens expire too early",
+            "tests pass locally but fail in CI", "the containers restart in a loop"]
+FILLER = ("the a to of and in is it you that for on with this was are be as at have but not "
+          "if or from so can just my your will when what there which one all would about").split()
+TECHNICAL = ("request response server client token session cookie header route middleware "
+             "database index query schema migration cache container image cluster pod service "
+             "function component state props hook promise async await callback error stack "
+             "trace log config environment variable build bundle deploy pipeline test mock").split()
+FRIENDLY = ["Thanks, that fixed it!", "Great answer, very clear.", "I respectfully disagree.",
+            "Could you add an example?", "This worked for me on version 3."]
+TOXIC = ["You're an idiot who shouldn't be allowed to post here!",
+         "Your question is very dumb. how are you not in playschool?",
+         "What a stupid answer, go away.", "Nobody cares about your garbage code."]
+
+
+def sample_lengths(size: int, mean_words: float, distribution: str = "lognormal",
+                   sigma: float = 0.6, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Word counts for a synthetic corpus.
+
+    Args:
+        size: Number of documents
+        mean_words: Mean document length in words
+        distribution: 'lognormal' (long tail, like real posts), 'uniform' (0.5x-1.5x mean) or 'fixed'
+        sigma: Spread of the lognormal distribution
+        rng: Numpy generator (seeded by the caller for reproducibility)
+    """
+    rng = rng or np.random.default_rng(0)
+    if distribution == "fixed":
+        lengths = np.full(size, mean_words)
+    elif distribution == "uniform":
+        lengths = rng.uniform(0.5 * mean_words, 1.5 * mean_words, size)
+    elif distribution == "lognormal":
+        # Choose mu so the distribution's mean equals mean_words
+        lengths = rng.lognormal(np.log(mean_words) - sigma ** 2 / 2, sigma, size)
+    else:
+        raise ValueError(f"Unknown length distribution '{distribution}'")
+    return np.maximum(1, np.round(lengths)).astype(int)
+
+
+def _prose(rng: random.Random, words: int) -> str:
+    sentences, current = [], []
+    for _ in range(words):
+        current.append(rng.choice(TECHNICAL) if rng.random() < 0.35 else rng.choice(FILLER))
+        if len(current) >= rng.randint(8, 18):
+            sentences.append(" ".join(current).capitalize() + ".")
+            current = []
+    if current:
+        sentences.append(" ".join(current).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def make_questions(size: int, mean_words: float = 60, distribution: str = "lognormal",
+                   seed: int = 0) -> List[Tuple[str, str]]:
+    """(title, description) pairs that read like forum questions"""
+    rng = random.Random(seed)
+    lengths = sample_lengths(size, mean_words, distribution, rng=np.random.default_rng(seed))
+    questions = []
+    for words in lengths:
+        topic, other = rng.choice(TOPICS), rng.choice(TOPICS)
+        title = f"How do I {rng.choice(VERBS)} {topic} when {rng.choice(PROBLEMS)}?"
+        description = f"I'm using {topic} with {other}. {_prose(rng, int(words))}"
+        questions.append((title, description))
+    return questions
+
+
+def make_answers(size: int, mean_words: float = 150, distribution: str = "lognormal",
+                 seed: int = 0) -> List[str]:
+    """Answer bodies mentioning forum topics"""
+    rng = random.Random(seed)
+    lengths = sample_lengths(size, mean_words, distribution, rng=np.random.default_rng(seed))
+    return [f"To {rng.choice(VERBS)} {rng.choice(TOPICS)}, {_prose(rng, int(words))}" for words in lengths]
+
+
+def make_labeled_comments(size: int, mean_words: float = 20, distribution: str = "lognormal",
+                          toxic_rate: float = 0.1, seed: int = 0) -> List[Tuple[str, bool]]:
+    """(comment, is_toxic) pairs, a toxic_rate fraction of them abusive"""
+    rng = random.Random(seed)
+    lengths = sample_lengths(size, mean_words, distribution, rng=np.random.default_rng(seed))
+    comments = []
+    for words in lengths:
+        toxic = rng.random() < toxic_rate
+        opener = rng.choice(TOXIC) if toxic else rng.choice(FRIENDLY)
+        comments.append((f"{opener} {_prose(rng, max(0, int(words) - len(opener.split())))}".strip(), toxic))
+    return comments
+
+
+def make_comments(size: int, mean_words: float = 20, distribution: str = "lognormal",
+                  toxic_rate: float = 0.1, seed: int = 0) -> List[str]:
+    """Short comments, a toxic_rate fraction of them abusive"""
+    return [text for text, _ in make_labeled_comments(size, mean_words, distribution, toxic_rate, seed)]
+
+
+def make_tags(size: int, seed: int = 0) -> List[str]:
+    """A tag catalog: the known topics first, then synthetic compound tags"""
+    rng = random.Random(seed)
+    tags = list(dict.fromkeys(TOPICS + [word.capitalize() for word in TECHNICAL]))
+    seen = set(tags)
+    while len(tags) < size:
+        tag = f"{rng.choice(TOPICS)} {rng.choice(TECHNICAL)}"
+        if tag in seen:
+            # Combinations run out around a thousand tags; number the rest
+            tag = f"{tag} {len(tags)}"
+        seen.add(tag)
+        tags.append(tag)
+    return tags[:size]
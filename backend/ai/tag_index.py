@@ -0,0 +1,212 @@
+import json
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tag_recommender import get_kw_model, preprocess_text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TagIndex:
+    def __init__(self, tags: Optional[Iterable[str]] = None, embedder=None):
+        """
+        Tag catalog embedded once into a contiguous, L2-normalized matrix.
+
+        Recommending tags for a question is then a single matrix-vector
+        product plus a top-k selection, independent of keyword matching.
+
+        Args:
+            tags: Initial tag names (e.g. every Tag.name in the database)
+            embedder: Object with embed(List[str]) -> np.ndarray; defaults to the KeyBERT sentence model
+        """
+        self.embedder = embedder or get_kw_model().model
+        self.tags = []
+        self._rows = {}
+        self._matrix = None  # capacity x dim, only the first len(self.tags) rows are used
+        self._lock = threading.Lock()
+
+        if tags:
+            self.add(tags)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._rows
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts and L2-normalize the rows"""
+        vectors = np.asarray(self.embedder.embed(texts), dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _tag_text(tag: str) -> str:
+        # Very short tags (e.g. "c#") can preprocess to nothing; embed them as written
+        return preprocess_text(tag) or tag.lower()
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        """Grow the matrix geometrically and make it writable before a change"""
+        current = self._matrix
+        if current is not None and current.flags.writeable and rows <= current.shape[0]:
+            return
+
+        capacity = max(rows, 16)
+        if current is not None:
+            # Doubling keeps repeated adds amortized O(1); a read-only memory map is copied as is
+            capacity = max(capacity, current.shape[0] * 2 if rows > current.shape[0] else current.shape[0])
+        matrix = np.empty((capacity, dim), dtype=np.float32)
+        if current is not None:
+            matrix[:len(self.tags)] = current[:len(self.tags)]
+        self._matrix = matrix
+
+    def add(self, tags: Iterable[str]) -> int:
+        """
+        Embed and add tags that are not in the index yet.
+
+        Returns:
+            Number of tags added
+        """
+        # Tags already indexed are skipped up front to save embedding them...
+        new_tags = list(dict.fromkeys(tag for tag in tags if tag not in self._rows))
+        if not new_tags:
+            return 0
+
+        vectors = self._embed([self._tag_text(tag) for tag in new_tags])
+        with self._lock:
+            # ...but only the check under the lock is authoritative: a concurrent add may have won
+            fresh = [row for row, tag in enumerate(new_tags) if tag not in self._rows]
+            if not fresh:
+                return 0
+            start = len(self.tags)
+            self._ensure_capacity(start + len(fresh), vectors.shape[1])
+            self._matrix[start:start + len(fresh)] = vectors[fresh]
+            for offset, row in enumerate(fresh):
+                tag = new_tags[row]
+                self._rows[tag] = start + offset
+                self.tags.append(tag)
+        return len(fresh)
+
+    def remove(self, tags: Iterable[str]) -> int:
+        """
+        Remove tags from the index by moving the last row into each freed slot.
+
+        Returns:
+            Number of tags removed
+        """
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                row = self._rows.pop(tag, None)
+                if row is None:
+                    continue
+                self._ensure_capacity(len(self.tags), self._matrix.shape[1])
+                last = len(self.tags) - 1
+                if row != last:
+                    moved = self.tags[last]
+                    self._matrix[row] = self._matrix[last]
+                    self.tags[row] = moved
+                    self._rows[moved] = row
+                self.tags.pop()
+                removed += 1
+        return removed
+
+    def top_k(self, vector: np.ndarray, k: int = 5, threshold: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Most similar tags to a normalized query vector.
+
+        Returns:
+            List of (tag, cosine similarity) pairs, best first
+        """
+        return self._top_k(vector, k, threshold)
+
+    def _top_k(self, vector: np.ndarray, k: int, threshold: float,
+               allowed: Optional[set] = None) -> List[Tuple[str, float]]:
+        """top_k() restricted to the allowed tags, scoring and ranking only their rows"""
+        with self._lock:
+            size = len(self.tags)
+            if allowed is None:
+                if size == 0:
+                    return []
+                scores = self._matrix[:size] @ vector
+                tags = list(self.tags)
+            else:
+                rows = np.sort(np.fromiter((self._rows[tag] for tag in allowed if tag in self._rows),
+                                           dtype=np.int64))
+                if len(rows) == 0:
+                    return []
+                scores = self._matrix[rows] @ vector
+                tags = [self.tags[row] for row in rows]
+
+        size = len(tags)
+        k = min(k, size)
+        best = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(tags[i], float(scores[i])) for i in best if scores[i] >= threshold]
+
+    @staticmethod
+    def _question_text(title: str, description: str) -> str:
+        return preprocess_text(f"{title} {description}") or f"{title} {description}"
+
+    def _select(self, vector: np.ndarray, top_n: int, threshold: float,
+                allowed: Optional[set]) -> List[str]:
+        return [tag for tag, _ in self._top_k(vector, top_n, threshold, allowed)]
+
+    def recommend(self, title: str, description: str, top_n: int = 5,
+                  threshold: float = 0.3, allowed: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Recommend tags for a question by embedding similarity to the catalog.
+
+        Args:
+            title: Question title
+            description: Question body
+            top_n: Most tags to return
+            threshold: Minimum cosine similarity
+            allowed: Only return these tags (None allows the whole index)
+        """
+        vector = self._embed([self._question_text(title, description)])[0]
+        return self._select(vector, top_n, threshold, set(allowed) if allowed is not None else None)
+
+    def recommend_batch(self, questions: List[Tuple[str, str]], top_n: int = 5, threshold: float = 0.3,
+                        allowed: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """recommend() for many (title, description) pairs with a single embedding call"""
+        if not questions:
+            return []
+        vectors = self._embed([self._question_text(title, description) for title, description in questions])
+        allowed = set(allowed) if allowed is not None else None
+        return [self._select(vector, top_n, threshold, allowed) for vector in vectors]
+
+    def save(self, path: str) -> None:
+        """Write the index to path.npy (vectors) and path.json (tag names)"""
+        with self._lock:
+            size = len(self.tags)
+            matrix = self._matrix[:size] if self._matrix is not None else np.empty((0, 0), dtype=np.float32)
+            np.save(f"{path}.npy", np.ascontiguousarray(matrix))
+            with open(f"{path}.json", 'w') as f:
+                json.dump(self.tags, f)
+        logger.info(f"Saved tag index with {size} tags to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, embedder=None) -> 'TagIndex':
+        """
+        Load an index written by save().
+
+        Args:
+            path: Path prefix passed to save()
+            mmap: Memory-map the vectors read-only instead of reading them into memory
+            embedder: Embedder for queries and later additions (defaults to the KeyBERT model)
+        """
+        index = cls(embedder=embedder)
+        with open(f"{path}.json") as f:
+            index.tags = json.load(f)
+        index._rows = {tag: row for row, tag in enumerate(index.tags)}
+        matrix = np.load(f"{path}.npy", mmap_mode='r' if mmap else None)
+        index._matrix = matrix if matrix.size else None
+        return index
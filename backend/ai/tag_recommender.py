@@ -1,82 +1,340 @@
-from keybert import KeyBERT
 from sklearn.feature_extraction.text import CountVectorizer
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
+from functools import lru_cache
+import os
 import string
+import threading
+import time
 import numpy as np
-nltk.download('punkt_tab', quiet=True)
+import instrumentation
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-# Download required NLTK data
-nltk.download('stopwords')
-nltk.download('wordnet')
-nltk.download('punkt')
+# Local resources only: nothing is downloaded at import or at first use.
+# VERITA_NLTK_DATA points at an nltk_data directory (punkt_tab, stopwords, wordnet);
+# VERITA_KEYBERT_MODEL is a sentence-transformers model directory or cached model name.
+NLTK_DATA_DIR = os.environ.get('VERITA_NLTK_DATA')
+KEYBERT_MODEL = os.environ.get('VERITA_KEYBERT_MODEL', 'all-MiniLM-L6-v2')
 
-# Initialize components
-kw_model = KeyBERT()
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+if NLTK_DATA_DIR:
+    nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+# Components are created on first use; see get_kw_model() etc.
+_init_lock = threading.RLock()
+_kw_model = None
+_lemmatizer = None
+_stop_words = None
 punctuation = set(string.punctuation)
+_punctuation_table = str.maketrans('', '', string.punctuation)
+
+# Forum vocabulary is repetitive, so tokenization and lemmatization are memoized per word
+TOKEN_CACHE_SIZE = 50000
+LEMMA_CACHE_SIZE = 100000
+
+def configure(nltk_data_dir=None, keybert_model=None):
+    """Point the recommender at local NLTK data and a local KeyBERT model (call before first use)"""
+    global KEYBERT_MODEL
+    if nltk_data_dir:
+        nltk.data.path.insert(0, nltk_data_dir)
+    if keybert_model:
+        KEYBERT_MODEL = keybert_model
+
+def get_kw_model():
+    """KeyBERT model, loaded from local files on first use"""
+    global _kw_model
+    if _kw_model is None:
+        with _init_lock:
+            if _kw_model is None:
+                from keybert import KeyBERT
+                from sentence_transformers import SentenceTransformer
+                _kw_model = KeyBERT(model=SentenceTransformer(KEYBERT_MODEL, local_files_only=True))
+    return _kw_model
+
+def get_lemmatizer():
+    """WordNet lemmatizer with its corpus loaded"""
+    global _lemmatizer
+    if _lemmatizer is None:
+        with _init_lock:
+            if _lemmatizer is None:
+                lemmatizer = WordNetLemmatizer()
+                lemmatizer.lemmatize('warmup')  # Forces the lazy WordNet corpus load now
+                _lemmatizer = lemmatizer
+    return _lemmatizer
+
+def get_stop_words():
+    """English stopwords as a frozenset"""
+    global _stop_words
+    if _stop_words is None:
+        with _init_lock:
+            if _stop_words is None:
+                _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+def warmup():
+    """
+    Load every component and run one recommendation so the first real request is fast.
+    
+    Returns:
+        Seconds spent per component
+    """
+    timings = {}
+    for name, load in (("stop_words", get_stop_words), ("lemmatizer", get_lemmatizer),
+                       ("kw_model", get_kw_model)):
+        start = time.perf_counter()
+        load()
+        timings[name] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    recommend_tags("Warmup question", "How do I warm up the tag recommender?", ["warmup"])
+    timings["first_recommendation"] = time.perf_counter() - start
+    return timings
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _tokenize_word(word):
+    # Punctuation is stripped before tokenizing, so word_tokenize never joins across
+    # whitespace and tokenizing word by word gives the same tokens as the whole text
+    return tuple(nltk.word_tokenize(word))
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def _lemmatize(token):
+    return get_lemmatizer().lemmatize(token)
+
+def preprocess_cache_stats():
+    """Hit statistics for the tokenization and lemmatization memos"""
+    stats = {}
+    for name, cached in (("tokenize", _tokenize_word), ("lemmatize", _lemmatize)):
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+    return stats
+
+def clear_preprocess_cache():
+    """Empty the tokenization and lemmatization memos"""
+    _tokenize_word.cache_clear()
+    _lemmatize.cache_clear()
 
 def preprocess_text(text):
     """Enhanced text preprocessing"""
-    # Lowercase
-    text = text.lower()
-    # Remove punctuation
-    text = ''.join([char for char in text if char not in punctuation])
+    # Lowercase and remove punctuation
+    text = text.lower().translate(_punctuation_table)
     # Tokenize and lemmatize
-    tokens = nltk.word_tokenize(text)
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
-    # Remove stopwords and short tokens
-    tokens = [token for token in tokens if token not in stop_words and len(token) > 2]
+    stop_words = get_stop_words()
+    tokens = []
+    for word in text.split():
+        for token in _tokenize_word(word):
+            lemma = _lemmatize(token)
+            # Remove stopwords and short tokens
+            if len(lemma) > 2 and lemma not in stop_words:
+                tokens.append(lemma)
     return ' '.join(tokens)
 
-def recommend_tags(title, description, available_tags, top_n=15, threshold=0.2):
-    """Improved tag recommendation system"""
-    # Combine and preprocess text
-    text = f"{title} {description}"
-    processed_text = preprocess_text(text)
+def recommend_tags(title, description, available_tags, top_n=15, threshold=0.2, index=None):
+    """
+    Improved tag recommendation system
+
+    With index (a TagIndex over the tag catalog, built once), the catalog is
+    not preprocessed or scanned per call: tags are ranked by embedding
+    similarity to the question with one matrix-vector product. In that mode
+    top_n is the number of tags returned, threshold is the minimum cosine
+    similarity, and available_tags only restricts the result (None allows
+    every indexed tag).
+    """
+    if index is not None:
+        return index.recommend(title, description, top_n, threshold, allowed=available_tags)
+
+    with instrumentation.timer("tags.preprocess"):
+        # Combine and preprocess text
+        text = f"{title} {description}"
+        processed_text = preprocess_text(text)
+    
+        # Prepare available tags (preprocessed for matching)
+        processed_tags = {tag: preprocess_text(tag) for tag in available_tags}
     
-    # Prepare available tags (preprocessed for matching)
-    processed_tags = {tag: preprocess_text(tag) for tag in available_tags}
+    with instrumentation.timer("tags.keywords"):
+        # Extract keywords with enhanced parameters
+        keywords = get_kw_model().extract_keywords(
+            processed_text,
+            keyphrase_ngram_range=(1, 3),  # Allow up to 3-word phrases
+            stop_words='english',
+            top_n=top_n,
+            use_mmr=True,  # Use Maximal Marginal Relevance for diversity
+            diversity=0.5,  # Balance between relevance and diversity
+            vectorizer=CountVectorizer(ngram_range=(1, 3))  # Match the ngram range
+        )
     
-    # Extract keywords with enhanced parameters
-    keywords = kw_model.extract_keywords(
-        processed_text,
-        keyphrase_ngram_range=(1, 3),  # Allow up to 3-word phrases
-        stop_words='english',
-        top_n=top_n,
-        use_mmr=True,  # Use Maximal Marginal Relevance for diversity
-        diversity=0.5,  # Balance between relevance and diversity
-        vectorizer=CountVectorizer(ngram_range=(1, 3))  # Match the ngram range
-    )
-    # Filter keywords by confidence threshold
-    keywords = [kw for kw in keywords if kw[1] >= threshold]
+    with instrumentation.timer("tags.match"):
+        # Filter keywords by confidence threshold
+        keywords = [kw for kw in keywords if kw[1] >= threshold]
     
-    # Prepare keyword set (lemmatized and lowercased)
-    keyword_set = set(k[0].lower() for k in keywords)
+        # Prepare keyword set (lemmatized and lowercased)
+        keyword_set = set(k[0].lower() for k in keywords)
     
-    # Find matches with processed tags
-    matched = []
-    for tag, processed_tag in processed_tags.items():
-        # Check for direct matches or subset matches
-        if (processed_tag in keyword_set or 
-            any(processed_tag in kw for kw in keyword_set) or
-            any(kw in processed_tag for kw in keyword_set)):
-            matched.append(tag)
+        # Find matches with processed tags
+        matched = []
+        for tag, processed_tag in processed_tags.items():
+            # Check for direct matches or subset matches
+            if (processed_tag in keyword_set or 
+                any(processed_tag in kw for kw in keyword_set) or
+                any(kw in processed_tag for kw in keyword_set)):
+                matched.append(tag)
     
-    # Sort by relevance (optional)
-    if matched and keywords:
-        # Create a relevance score for each matched tag
-        tag_scores = {}
-        for tag in matched:
-            processed_tag = processed_tags[tag]
-            # Find the maximum similarity score for this tag
-            max_score = max([score for kw, score in keywords 
-                           if processed_tag in kw or kw in processed_tag], default=0)
-            tag_scores[tag] = max_score
+        # Sort by relevance (optional)
+        if matched and keywords:
+            # Create a relevance score for each matched tag
+            tag_scores = {}
+            for tag in matched:
+                processed_tag = processed_tags[tag]
+                # Find the maximum similarity score for this tag
+                max_score = max([score for kw, score in keywords 
+                               if processed_tag in kw or kw in processed_tag], default=0)
+                tag_scores[tag] = max_score
         
-        # Sort tags by their highest matching score
-        matched = sorted(matched, key=lambda x: tag_scores[x], reverse=True)
+            # Sort tags by their highest matching score
+            matched = sorted(matched, key=lambda x: tag_scores[x], reverse=True)
     
-    return matched
\ No newline at end of file
+    return matched
+
+class _BatchScorer:
+    """Preprocessed tag set plus the shared settings for recommend_tags_batch"""
+
+    def __init__(self, available_tags, top_n, threshold, match_cache_size=4096):
+        self.processed_tags = {tag: preprocess_text(tag) for tag in available_tags}
+        self.tags = list(self.processed_tags)
+        self.top_n = top_n
+        self.threshold = threshold
+        self.vectorizer = CountVectorizer(ngram_range=(1, 3))
+        # keyword -> boolean row over self.tags; keywords repeat heavily across an archive
+        self._matches = {}
+        self._match_cache_size = match_cache_size
+
+    def _match_row(self, keyword):
+        row = self._matches.get(keyword)
+        if row is None:
+            row = np.fromiter((processed_tag in keyword or keyword in processed_tag
+                               for processed_tag in self.processed_tags.values()),
+                              dtype=bool, count=len(self.tags))
+            if len(self._matches) >= self._match_cache_size:
+                self._matches.clear()
+            self._matches[keyword] = row
+        return row
+
+    def _extract(self, docs):
+        """Keywords for every doc in one KeyBERT call (one embedding pass per batch)"""
+        keywords = get_kw_model().extract_keywords(
+            docs,
+            keyphrase_ngram_range=(1, 3),
+            stop_words='english',
+            top_n=self.top_n,
+            use_mmr=True,
+            diversity=0.5,
+            vectorizer=self.vectorizer
+        )
+        # KeyBERT returns a flat list for a single document and [] when nothing could be extracted
+        if len(docs) == 1 and (not keywords or isinstance(keywords[0], tuple)):
+            return [keywords]
+        if not keywords:
+            return [[] for _ in docs]
+        return keywords
+
+    def score(self, texts):
+        """Recommended tags for each text, identical to recommend_tags on that text"""
+        with instrumentation.timer("tags.preprocess"):
+            processed = [preprocess_text(text) for text in texts]
+        results = [[] for _ in texts]
+        positions = [i for i, doc in enumerate(processed) if doc]
+        if not positions or not self.tags:
+            return results
+
+        with instrumentation.timer("tags.keywords"):
+            extracted = self._extract([processed[i] for i in positions])
+
+        for position, keywords in zip(positions, extracted):
+            keywords = [(kw.lower(), score) for kw, score in keywords if score >= self.threshold]
+            if not keywords:
+                continue
+            with instrumentation.timer("tags.match"):
+                # tags x keywords match matrix; a tag's score is its best matching keyword
+                match = np.column_stack([self._match_row(kw) for kw, _ in keywords])
+                scores = np.array([score for _, score in keywords], dtype=np.float64)
+                tag_scores = np.where(match, scores, -np.inf).max(axis=1)
+                matched = np.flatnonzero(match.any(axis=1))
+                order = matched[np.argsort(-tag_scores[matched], kind='stable')]
+                results[position] = [self.tags[i] for i in order]
+        return results
+
+
+_worker_scorer = None
+
+def _init_batch_worker(scorer):
+    global _worker_scorer
+    _worker_scorer = scorer
+
+def _score_in_worker(texts):
+    return _worker_scorer.score(texts)
+
+def recommend_tags_batch(items, available_tags, top_n=15, threshold=0.2, batch_size=64,
+                         processes=None, index=None):
+    """
+    Recommend tags for many questions, yielding one result per item in input order.
+
+    Tags are preprocessed once, each batch of questions is embedded in a single
+    KeyBERT call with a shared vectorizer, and matching is done on a
+    tags x keywords matrix. Items are consumed lazily, so memory stays flat
+    however many questions are streamed through.
+
+    Args:
+        items: Iterable of (title, description) pairs
+        available_tags: Tags to choose from
+        top_n: Keywords extracted per question
+        threshold: Minimum keyword confidence
+        batch_size: Questions per embedding batch
+        processes: Spread batches over this many worker processes (None runs in-process); workers
+            are spawned, so a calling script needs an if __name__ == "__main__" guard
+        index: TagIndex to rank tags with instead of keyword matching (see recommend_tags)
+
+    Yields:
+        List of recommended tags per item, same as recommend_tags would return
+    """
+    def batches(as_pairs=False):
+        batch = []
+        for title, description in items:
+            batch.append((title, description) if as_pairs else f"{title} {description}")
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if index is not None:
+        # One embedding call and one matrix product per batch; nothing worth spreading over processes
+        for batch in batches(as_pairs=True):
+            yield from index.recommend_batch(batch, top_n, threshold, allowed=available_tags)
+        return
+
+    scorer = _BatchScorer(available_tags, top_n, threshold)
+
+    if not processes:
+        for batch in batches():
+            yield from scorer.score(batch)
+        return
+
+    # Each worker loads its own model; at most two batches per worker are in flight.
+    # Workers are spawned, not forked: forking after torch/KeyBERT have started threads can deadlock
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_batch_worker, initargs=(scorer,),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for batch in batches():
+            pending.append(pool.submit(_score_in_worker, batch))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,87 @@
+import re
+from types import SimpleNamespace
+
+from answer_summarizer import GeminiFlashSummarizer, estimate_tokens, split_into_chunks
+
+
+def test_split_keeps_paragraphs_whole():
+    paragraphs = ["First answer. It is short.", "Second answer, also short.", "Third answer."]
+    text = "\n\n".join(paragraphs)
+    chunks = split_into_chunks(text, max_tokens=12)
+    assert all(estimate_tokens(chunk) <= 12 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_split_long_paragraph_rejoins_sentences_with_spaces():
+    sentences = [f"Sentence number {i} explains one more step of the fix." for i in range(30)]
+    paragraph = " ".join(sentences)
+    text = f"Short intro.\n\n{paragraph}\n\nShort outro."
+    chunks = split_into_chunks(text, max_tokens=40)
+
+    assert len(chunks) > 2
+    assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+    # The only paragraph breaks left are the two real ones
+    breaks = [part for chunk in chunks for part in chunk.split("\n\n")[1:]]
+    assert sum(chunk.count("\n\n") for chunk in chunks) <= 2
+    assert all(part.startswith(("Sentence number 0 ", "Short outro.")) for part in breaks)
+    assert re.sub(r"\s+", " ", " ".join(chunks)) == re.sub(r"\s+", " ", text)
+
+
+def test_split_oversized_sentence_falls_back_to_words():
+    words = [f"word{i}" for i in range(200)]
+    sentence = " ".join(words) + " stops"
+    chunks = split_into_chunks(sentence, max_tokens=25)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 25 for chunk in chunks)
+    assert all("\n" not in chunk for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+
+class RecordingModel:
+    """Returns a fixed summary, cut off at max_output_tokens (~4 characters per token) like the API"""
+    model_name = "recording"
+
+    def __init__(self, summary):
+        self.summary = summary
+        self.prompts = []
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config):
+        self.prompts.append(prompt)
+        self.configs.append(generation_config)
+        return SimpleNamespace(text=self.summary[:generation_config["max_output_tokens"] * 4])
+
+
+SOURCE = " ".join(f"Answer {i} recommends pinning the dependency and rebuilding the cache." for i in range(40))
+
+
+def test_custom_prompt_without_placeholder_gets_length_requirement():
+    model = RecordingModel("Pin the dependency.")
+    summarizer = GeminiFlashSummarizer(model=model)
+    summarizer.summarize(SOURCE, max_length=180, system_prompt="Summarize this thread for a {newsletter}.")
+
+    prompt = model.prompts[0]
+    assert prompt.startswith("Summarize this thread for a {newsletter}.")
+    assert "Length: ~180 characters" in prompt
+    assert "Output ONLY the summary text" in prompt
+
+
+def test_default_prompt_states_length_once():
+    model = RecordingModel("Pin the dependency.")
+    GeminiFlashSummarizer(model=model).summarize(SOURCE, max_length=180)
+
+    prompt = model.prompts[0]
+    assert "Approximately 180 characters" in prompt
+    assert "Summary Requirements" not in prompt
+
+
+def test_summary_overshooting_max_length_is_not_truncated():
+    max_length = 300
+    # Models overshoot the target; half again as long must still fit under the output cap
+    summary = ("Pin the dependency, rebuild the cache and restart the workers. " * 10)[:int(max_length * 1.5)]
+    model = RecordingModel(summary)
+    result = GeminiFlashSummarizer(model=model).summarize(SOURCE, max_length=max_length)
+
+    assert result["summary"] == summary.strip()
+    assert model.configs[0]["max_output_tokens"] >= estimate_tokens(summary)
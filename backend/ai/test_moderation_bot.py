@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from moderation_bot import ToxicityChecker
+
+DIMENSIONS = ('toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult', 'identity_attack')
+
+
+class FakeDetoxify:
+    """Deterministic per-text scores with full float64 mantissas, for a list or a single text"""
+
+    def _scores(self, text):
+        rng = np.random.default_rng(sum(map(ord, text)))
+        return dict(zip(DIMENSIONS, rng.random(len(DIMENSIONS))))
+
+    def predict(self, texts):
+        if isinstance(texts, str):
+            return self._scores(texts)
+        rows = [self._scores(text) for text in texts]
+        return {dim: [row[dim] for row in rows] for dim in DIMENSIONS}
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    monkeypatch.setattr(ToxicityChecker, "_load_model", lambda self, model_type: FakeDetoxify())
+    return ToxicityChecker(custom_weights={'toxicity': 0.1 + 0.2, 'insult': 1 / 3})
+
+
+def test_batch_and_single_scores_are_identical(checker):
+    texts = [f"comment {i} about {'x' * (i % 13)} things" for i in range(100)]
+    batched = checker.batch_check(texts, batch_size=16)
+    single = [checker.check_toxicity(text) for text in texts]
+
+    for batch_result, single_result in zip(batched, single):
+        assert batch_result["toxicity_score"] == single_result["toxicity_score"]
+        assert batch_result["flagged"] == single_result["flagged"]
+        assert batch_result["detailed_scores"] == single_result["detailed_scores"]
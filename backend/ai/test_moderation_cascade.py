@@ -0,0 +1,48 @@
+from moderation_cascade import ModerationCascade
+
+
+class FakePreprocessor:
+    def process_batch(self, texts):
+        return [text.strip().lower() for text in texts], {}
+
+
+class FakeChecker:
+    """Scores a text by how often it says "bad"; enough of the checker API for the cascade"""
+    threshold = 0.7
+
+    def __init__(self):
+        self.preprocessor = FakePreprocessor()
+
+    def find_banned_words(self, text):
+        return []
+
+    def batch_check(self, texts, threshold=None, batch_size=None):
+        current_threshold = threshold if threshold is not None else self.threshold
+        results = []
+        for text in texts:
+            score = min(text.lower().split().count("bad") / 4, 1.0)
+            results.append({"flagged": score > current_threshold, "toxicity_score": score,
+                            "detailed_scores": {"toxicity": score}, "threshold": current_threshold,
+                            "text_length": len(text), "triggered_banned_words": [], "error": None})
+        return results
+
+
+def make_texts(n):
+    return [" ".join(["bad"] * (i % 5) + ["comment", "number", str(i)]) for i in range(n)]
+
+
+def test_prefiltered_scores_stay_below_threshold(monkeypatch):
+    cascade = ModerationCascade(FakeChecker())
+    cascade.fit(make_texts(200))
+    # A cutoff calibrated for a lenient threshold, used with a strict one
+    monkeypatch.setattr(cascade, "cutoff", lambda threshold=None: 0.9)
+
+    for threshold in (0.1, 0.3, 0.6):
+        results = cascade.batch_check(make_texts(50), threshold)
+        prefiltered = [result for result in results if result["stage"] == "prefilter"]
+        assert prefiltered
+        for result in prefiltered:
+            assert result["toxicity_score"] < threshold
+            assert result["flagged"] is False
+        for result in results:
+            assert result["flagged"] == (result["toxicity_score"] > threshold)
@@ -0,0 +1,50 @@
+import pytest
+
+from moderation_bot import ToxicityChecker
+
+sample_texts = [
+    "Your question is very dumb. how are you not in playschool?",
+    "This is a perfectly normal comment.",
+    "I respectfully disagree with your opinion.",
+    "You're an idiot who shouldn't be allowed to post here!",
+    "Thanks, setting the Authorization header fixed my 401 error."
+]
+
+# Max absolute difference allowed per toxicity dimension
+tolerances = {'onnx': 1e-3, 'onnx-int8': 0.05}
+
+
+def reference_scores():
+    return ToxicityChecker(backend='torch').batch_check(sample_texts)
+
+
+@pytest.fixture(scope="module")
+def expected():
+    pytest.importorskip("onnxruntime")
+    try:
+        return reference_scores()
+    except RuntimeError as e:
+        pytest.skip(f"Detoxify model unavailable: {e}")
+
+
+def check_parity(backend, expected):
+    checker = ToxicityChecker(backend=backend)
+    for text, want, got in zip(sample_texts, expected, checker.batch_check(sample_texts)):
+        for dim, score in want["detailed_scores"].items():
+            diff = abs(score - got["detailed_scores"][dim])
+            assert diff <= tolerances[backend], f"{backend} {dim} off by {diff:.4f} for: {text}"
+
+
+def test_onnx_parity(expected):
+    check_parity('onnx', expected)
+
+
+def test_onnx_int8_parity(expected):
+    check_parity('onnx-int8', expected)
+
+
+if __name__ == "__main__":
+    expected = reference_scores()
+    for backend in tolerances:
+        check_parity(backend, expected)
+        print(f"✅ {backend} scores match torch within {tolerances[backend]}")
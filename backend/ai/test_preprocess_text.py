@@ -0,0 +1,46 @@
+import nltk
+import pytest
+
+import synthetic_corpus
+from bench_preprocess import legacy_preprocess_text
+from tag_recommender import (clear_preprocess_cache, get_lemmatizer, get_stop_words, preprocess_cache_stats,
+                             preprocess_text)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def nltk_data():
+    try:
+        get_stop_words()
+        get_lemmatizer()
+        nltk.word_tokenize("probe")
+    except LookupError:
+        pytest.skip("NLTK stopwords, wordnet or punkt data is not installed")
+
+
+def test_memoized_matches_original():
+    clear_preprocess_cache()
+    texts = [f"{title} {description}" for title, description in synthetic_corpus.make_questions(200, seed=0)]
+    texts += ["", "   ", "C++ vs. C#: what's faster?", "Don't re-install node_modules!!", "e.g. 3.14 -- ok"]
+    for text in texts:
+        assert preprocess_text(text) == legacy_preprocess_text(text)
+
+
+def test_cache_hit_after_input_mutation():
+    clear_preprocess_cache()
+    words = ["Running", "the", "migrations", "breaks", "my", "Django", "models"]
+    first = " ".join(words)
+    assert preprocess_text(first) == legacy_preprocess_text(first)
+    misses = preprocess_cache_stats()["tokenize"]["misses"]
+
+    # Same words mutated in place: case, punctuation and one replacement
+    words[0] = words[0].upper()
+    words[3] = "breaking,"
+    words[-1] = "models!"
+    second = " ".join(words)
+    before = preprocess_cache_stats()["tokenize"]
+    assert preprocess_text(second) == legacy_preprocess_text(second)
+    after = preprocess_cache_stats()["tokenize"]
+    assert after["hits"] > before["hits"]
+    assert after["misses"] - misses == 1  # only "breaking" is new
+    # The earlier result is unaffected by what the later call cached
+    assert preprocess_text(first) == legacy_preprocess_text(first)
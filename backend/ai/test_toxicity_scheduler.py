@@ -0,0 +1,40 @@
+import pytest
+
+from toxicity_scheduler import ToxicityScheduler
+
+
+class FakeChecker:
+    """Scores a text by its length; only batch_check is used by the scheduler"""
+    threshold = 0.5
+
+    def __init__(self):
+        self.calls = []
+
+    def batch_check(self, texts, threshold=None, batch_size=None):
+        self.calls.append(list(texts))
+        current_threshold = threshold if threshold is not None else self.threshold
+        results = []
+        for text in texts:
+            score = min(len(text) / 10, 1.0)
+            results.append({"flagged": score > current_threshold, "toxicity_score": score,
+                            "threshold": current_threshold, "triggered_banned_words": [], "error": None})
+        return results
+
+
+def test_invalid_threshold_fails_only_its_own_future():
+    checker = FakeChecker()
+    # A long max_wait keeps every submission in one batch
+    with ToxicityScheduler(checker, max_batch_size=8, max_wait=0.5) as scheduler:
+        futures = [scheduler.submit("abcdef", 0.9), scheduler.submit("abcdef", "high"),
+                   scheduler.submit("abcdef", 0.2), scheduler.submit("abcdef", [0.5]),
+                   scheduler.submit("abcdef")]
+        valid = [futures[0], futures[2], futures[4]]
+        results = [future.result(5) for future in valid]
+
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    with pytest.raises(ValueError):
+        futures[3].result(5)
+    assert checker.calls == [["abcdef"] * 3]
+    assert [result["flagged"] for result in results] == [False, True, True]
+    assert [result["threshold"] for result in results] == [0.9, 0.2, 0.5]
@@ -0,0 +1,191 @@
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+FENCED_CODE = re.compile(r"```.*?```", re.S)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class HeuristicTokenizer:
+    """Dependency-free estimate for Gemini-style tokenizers (~4 characters per token)"""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return max(1, len(text) // 4) if text else 0
+
+
+class TokenizersTokenizer:
+    def __init__(self, path: str):
+        """
+        Exact counts from a local Hugging Face tokenizer.json
+
+        A SentencePiece-based tokenizer from the same model family (e.g. Gemma
+        for Gemini) gives counts much closer to billing than the heuristic.
+        """
+        from tokenizers import Tokenizer
+
+        self.name = path
+        self._tokenizer = Tokenizer.from_file(path)
+        self._tokenizer.no_truncation()
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids) if text else 0
+
+
+class CallableTokenizer:
+    """Adapter for any function mapping text to a token count"""
+
+    def __init__(self, fn: Callable[[str], int], name: Optional[str] = None):
+        self.fn = fn
+        self.name = name or getattr(fn, "__name__", "custom")
+
+    def count(self, text: str) -> int:
+        return self.fn(text) if text else 0
+
+
+def get_tokenizer(spec: Union[None, str, Callable[[str], int], object] = None):
+    """
+    Resolve a tokenizer setting.
+
+    Args:
+        spec: None for the heuristic, a path to a tokenizer.json, a
+            text -> count function, or any object with a count(text) method
+    """
+    if spec is None:
+        return HeuristicTokenizer()
+    if isinstance(spec, str):
+        return TokenizersTokenizer(spec)
+    if hasattr(spec, "count") and callable(spec.count):
+        return spec
+    if callable(spec):
+        return CallableTokenizer(spec)
+    raise ValueError(f"Unsupported tokenizer: {spec!r}")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def dedupe_thread(text: str, min_chars: int = 40) -> Tuple[str, Dict[str, int]]:
+    """
+    Remove content that repeats earlier parts of a thread.
+
+    Replies often quote earlier answers ("> ...") or paste the same code
+    block again. Quoted lines whose text already appeared, code blocks
+    identical to an earlier one (ignoring whitespace) and repeated
+    paragraphs are dropped; repeated code leaves a short placeholder so the
+    reply still reads naturally. Short fragments (under min_chars) are
+    always kept.
+
+    Returns:
+        Tuple of (deduplicated text, counts of removed quotes, code blocks and paragraphs)
+    """
+    stats = {"quotes": 0, "code_blocks": 0, "paragraphs": 0}
+    seen_code = set()
+
+    def replace_code(match):
+        key = _normalize(match.group(0))
+        if len(key) >= min_chars and key in seen_code:
+            stats["code_blocks"] += 1
+            return "[same code as above]"
+        seen_code.add(key)
+        return match.group(0)
+
+    text = FENCED_CODE.sub(replace_code, text)
+
+    seen_parts: List[str] = []
+    seen_text, seen_joined = "", 0
+    seen_paragraphs = set()
+    kept_paragraphs = []
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        lines = []
+        for line in paragraph.split("\n"):
+            stripped = line.lstrip()
+            if stripped.startswith(">"):
+                quoted = _normalize(stripped.lstrip("> "))
+                if seen_joined < len(seen_parts):
+                    seen_text, seen_joined = " ".join(seen_parts), len(seen_parts)
+                if len(quoted) >= min_chars and quoted in seen_text:
+                    stats["quotes"] += 1
+                    continue
+            lines.append(line)
+        paragraph = "\n".join(lines).strip()
+        if not paragraph:
+            continue
+
+        key = _normalize(paragraph)
+        if len(key) >= min_chars and key in seen_paragraphs:
+            stats["paragraphs"] += 1
+            continue
+        seen_paragraphs.add(key)
+        seen_parts.append(key)
+        kept_paragraphs.append(paragraph)
+    return "\n\n".join(kept_paragraphs), stats
+
+
+def _collapse_code(match, keep_lines: int) -> str:
+    lines = match.group(0).split("\n")
+    if len(lines) <= 2 * keep_lines + 1:
+        return match.group(0)
+    omitted = len(lines) - 2 * keep_lines
+    return "\n".join(lines[:keep_lines] + [f"... ({omitted} lines omitted)"] + lines[-keep_lines:])
+
+
+def fit_to_budget(text: str, max_tokens: int, tokenizer=None, code_lines: int = 6) -> Tuple[str, bool]:
+    """
+    Shrink text to max_tokens, cutting the least informative parts first.
+
+    Long code blocks are reduced to their first and last lines; if that is
+    not enough, trailing paragraphs are dropped (a thread's opening answers
+    usually carry the accepted solution).
+
+    Returns:
+        Tuple of (text within budget, whether anything was cut)
+    """
+    tokenizer = tokenizer or HeuristicTokenizer()
+    if tokenizer.count(text) <= max_tokens:
+        return text, False
+
+    text = FENCED_CODE.sub(lambda match: _collapse_code(match, code_lines), text)
+    if tokenizer.count(text) <= max_tokens:
+        return text, True
+
+    marker = "[remaining answers omitted]"
+    budget = max_tokens - tokenizer.count(marker)
+    kept: List[str] = []
+    used = 0
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        cost = tokenizer.count(paragraph + "\n\n")
+        if used + cost > budget:
+            if not kept:
+                # A single oversized paragraph: keep its head
+                ratio = budget / max(cost, 1)
+                kept.append(paragraph[:max(1, math.floor(len(paragraph) * ratio))])
+            break
+        kept.append(paragraph)
+        used += cost
+    kept.append(marker)
+    return "\n\n".join(kept), True
+
+
+def chars_per_token(text: str, tokenizer=None, sample_chars: int = 4000) -> float:
+    """Characters per token measured on the start of text (4.0 when there is nothing to measure)"""
+    tokenizer = tokenizer or HeuristicTokenizer()
+    sample = text[:sample_chars]
+    tokens = tokenizer.count(sample)
+    return len(sample) / tokens if tokens else 4.0
+
+
+def output_token_limit(max_length: int, text: str, tokenizer=None, headroom: float = 2.0,
+                       minimum: int = 16) -> int:
+    """
+    Output token cap for a summary of about max_length characters.
+
+    The characters-per-token ratio is measured on the input itself, so dense
+    text (code, non-English) gets a proportionally larger limit than prose.
+    max_length is only a target the model often overshoots, and only tokens
+    actually generated are billed, so the cap leaves twice the room rather
+    than risk cutting a summary off mid-sentence.
+    """
+    return max(minimum, math.ceil(max_length / chars_per_token(text, tokenizer) * headroom))
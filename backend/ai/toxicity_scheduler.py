@@ -0,0 +1,82 @@
+import logging
+import numbers
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple, Union
+
+from micro_batcher import MicroBatcher
+from moderation_bot import ToxicityChecker
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ToxicityScheduler:
+    def __init__(self, checker: ToxicityChecker, max_batch_size: int = 32, max_wait: float = 0.005,
+                 max_queue: int = 1000):
+        """
+        Dynamic micro-batching in front of a ToxicityChecker.
+
+        Callers submit single texts from any thread and get futures back. A
+        single worker gathers waiting texts into batches of at most
+        max_batch_size, waiting no longer than max_wait for a batch to fill,
+        and scores each batch with one batch_check call. Only one forward
+        pass runs at a time, so concurrent callers no longer compete for CPU.
+
+        Args:
+            checker: Loaded ToxicityChecker
+            max_batch_size: Most texts per forward pass
+            max_wait: Seconds the first text in a batch may wait for more
+            max_queue: Most texts waiting at once (submit raises QueueFullError beyond it)
+        """
+        self.checker = checker
+        self.batcher = MicroBatcher(self._check_batch, max_batch_size, max_wait, max_queue,
+                                    name="toxicity")
+
+    def _check_batch(self, items: List[Tuple[str, Optional[float]]]) -> List[Dict]:
+        thresholds = {threshold for _, threshold in items}
+        if len(thresholds) == 1:
+            return self.checker.batch_check([text for text, _ in items], thresholds.pop(),
+                                            batch_size=len(items))
+
+        # Thresholds only affect flagging, so score once and re-apply each caller's threshold
+        results = self.checker.batch_check([text for text, _ in items], batch_size=len(items))
+        for result, (_, threshold) in zip(results, items):
+            if threshold is None:
+                continue
+            result["threshold"] = threshold
+            if not result["error"]:
+                result["flagged"] = bool(result["toxicity_score"] > threshold or result["triggered_banned_words"])
+        return results
+
+    def submit(self, text: str, threshold: Optional[float] = None) -> Future:
+        """
+        Queue a text; the future resolves to the same dict check_toxicity returns.
+
+        A threshold that is not a number fails only this future with ValueError,
+        so it can't break the flagging of the rest of its batch.
+        """
+        if threshold is not None and not isinstance(threshold, numbers.Real):
+            future = Future()
+            future.set_exception(ValueError(f"threshold must be a number, got {threshold!r}"))
+            return future
+        return self.batcher.submit((text, threshold))
+
+    def check(self, text: str, threshold: Optional[float] = None,
+              timeout: Optional[float] = None) -> Dict[str, Union[bool, float, dict, str]]:
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(text, threshold).result(timeout)
+
+    def stats(self) -> Dict:
+        """Queue wait p50/p99, batch size histogram and throughput counters"""
+        return self.batcher.stats()
+
+    def close(self) -> None:
+        """Finish queued texts and stop the worker"""
+        self.batcher.close()
+
+    def __enter__(self) -> 'ToxicityScheduler':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()